@@ -10,6 +10,23 @@ class DBError(AppError):
     user_msg = "註解儲存失敗"
 
 
+class ConflictError(DBError):
+    user_msg = "註解已被其他使用者修改"
+
+    def __init__(self, msg=None, conflicts=None):
+        super().__init__(msg)
+        # {image_path: {"local_note", "remote_note", "remote_version"}}
+        self.conflicts = conflicts or {}
+
+
+class BackupError(DBError):
+    user_msg = "資料庫備份 / 還原失敗"
+
+
+class OperationCancelledError(AppError):
+    user_msg = "作業已取消"
+
+
 class ImageError(AppError):
     user_msg = "無法取得圖源"
 
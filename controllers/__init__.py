@@ -1,2 +1,3 @@
 
 from .image_controller import ImageAnnotationController
+from .dataset_exporter import DatasetExporter
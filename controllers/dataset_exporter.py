@@ -0,0 +1,256 @@
+""" 訓練資料集匯出
+ - 串流 AnnotationDB 中已註記的列 (不一次載入)
+ - 以 process pool 平行縮圖 / 重新編碼
+ - 輸出格式：
+     files => images/<id>.<ext> + manifest (jsonl / csv)
+     tar   => shard-00000.tar (每個 shard 固定張數，內含 <id>.<ext> 與 <id>.txt) + manifest
+ - _export_state.json 記錄進度，中斷後以相同參數重跑即可續傳
+ - 回傳吞吐量報告
+"""
+
+import io
+import os
+import csv
+import json
+import time
+import tarfile
+import logging
+from itertools import islice
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+from config.errors import AppError, PathError, OperationCancelledError
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "_export_state.json"
+FORMAT_SUFFIX = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+
+
+def _encode_image(task):
+    # 子程序：解碼 => 依 EXIF 轉正 => 縮圖 => 重新編碼
+    # task = (row_id, src_path, src_bytes, max_size, image_format, quality)
+    row_id, src_path, src_bytes, max_size, image_format, quality = task
+    try:
+        img = Image.open(io.BytesIO(src_bytes) if src_bytes is not None else src_path)
+        if max_size and img.format == "JPEG":
+            # JPEG 可直接以縮小比例解碼，省下大部分解碼時間
+            img.draft("RGB", max_size)
+        img = ImageOps.exif_transpose(img)
+        if max_size:
+            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        if image_format == "JPEG" and img.mode != "RGB":
+            img = img.convert("RGB")
+
+        buf = io.BytesIO()
+        options = {"quality": quality} if image_format in ("JPEG", "WEBP") else {}
+        img.save(buf, format=image_format, **options)
+        return row_id, buf.getvalue(), img.width, img.height, None
+
+    except Exception as e:
+        return row_id, None, 0, 0, f"{type(e).__name__}: {e}"
+
+
+class DatasetExporter:
+    def __init__(self, db, out_dir, repo=None, *, max_size=None, image_format="JPEG", quality=90,
+                 layout="files", shard_size=1000, manifest="jsonl", workers=None, window=None):
+        # 初始化
+        try:
+            out_dir = Path(out_dir)
+            out_dir.mkdir(parents=True, exist_ok=True)
+        except Exception:
+            logger.exception(f"輸出資料夾建立失敗: {out_dir}")
+            raise PathError()
+
+        image_format = image_format.upper()
+        if image_format not in FORMAT_SUFFIX:
+            raise AppError(f"不支援的輸出格式: {image_format}")
+        if layout not in ("files", "tar"):
+            raise AppError(f"不支援的輸出結構: {layout}")
+        if manifest not in ("jsonl", "csv"):
+            raise AppError(f"不支援的 manifest 格式: {manifest}")
+
+        self.db = db
+        # 壓縮檔圖源的路徑不是實體檔案，需由 repo 讀出位元組
+        self.repo = repo
+        self.out_dir = out_dir
+        self.spec = {
+            "max_size": list(max_size) if max_size else None,
+            "image_format": image_format,
+            "quality": quality,
+            "layout": layout,
+            "shard_size": shard_size,
+            "manifest": manifest,
+        }
+        self.workers = workers or os.cpu_count() or 1
+        # 每次送進 process pool 的筆數；處理完一批才讀下一批，記憶體用量固定
+        self.window = window or self.workers * 32
+        self.suffix = FORMAT_SUFFIX[image_format]
+        self.manifest_path = out_dir / f"manifest.{manifest}"
+        self.state_path = out_dir / STATE_FILE
+
+    # ========== 進度 ==========
+    def _load_state(self):
+        # 讀取續傳進度；參數不同時拒絕續傳，避免同一份輸出混用兩種規格
+        if not self.state_path.is_file():
+            return {"last_id": 0, "count": 0, "shard": 0, "manifest_offset": 0, "spec": self.spec}
+
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state["spec"] != self.spec:
+            raise AppError(f"{self.out_dir} 已有不同參數的匯出進度，請改用新的輸出資料夾")
+        return state
+
+    def _save_state(self, state):
+        # 先寫暫存檔再 replace，進度檔不會寫到一半
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        tmp_path.replace(self.state_path)
+
+    # ========== 輸入 ==========
+    def _make_task(self, row_id, img_path):
+        max_size = tuple(self.spec["max_size"]) if self.spec["max_size"] else None
+        fmt, quality = self.spec["image_format"], self.spec["quality"]
+        if Path(img_path).is_file():
+            return row_id, img_path, None, max_size, fmt, quality
+        if self.repo is not None:
+            try:
+                return row_id, img_path, self.repo.read_bytes(img_path), max_size, fmt, quality
+            except Exception:
+                pass
+        return None
+
+    # ========== 輸出 ==========
+    def _write_manifest(self, manifest, record):
+        if self.spec["manifest"] == "jsonl":
+            manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            csv.writer(manifest).writerow([record["file"], record["note"], record["source"]])
+
+    def run(self, progress=None, cancel=None):
+        """
+        Use case:
+            - 匯出所有已註記圖片，回傳吞吐量報告
+            - progress(report): 每處理完一批回報一次
+            - cancel(): 回傳 True 時於批次之間停止，進度已保存，可續傳
+        """
+        state = self._load_state()
+        resumed_from = state["count"]
+        if resumed_from:
+            logger.info(f"續傳匯出: 已完成 {resumed_from} 筆 (last_id={state['last_id']})")
+
+        layout = self.spec["layout"]
+        if layout == "files":
+            (self.out_dir / "images").mkdir(exist_ok=True)
+
+        # manifest 截斷到上次檢查點，丟棄中斷時多寫的部分
+        manifest = open(self.manifest_path, "a+", encoding="utf-8", newline="")
+        manifest.truncate(state["manifest_offset"])
+        manifest.seek(state["manifest_offset"])
+        if state["manifest_offset"] == 0 and self.spec["manifest"] == "csv":
+            csv.writer(manifest).writerow(["file", "note", "source"])
+
+        report = {
+            "exported": 0, "skipped": 0, "failed": 0, "bytes_written": 0,
+            "resumed_from": resumed_from, "elapsed_sec": 0.0, "images_per_sec": 0.0,
+        }
+        start = time.perf_counter()
+        shard = None
+        shard_count = 0
+        last_id = state["last_id"]
+        rows = self.db.iter_annotated(after_id=state["last_id"])
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                while True:
+                    if cancel and cancel():
+                        raise OperationCancelledError()
+
+                    batch = list(islice(rows, self.window))
+                    if not batch:
+                        break
+                    last_id = batch[-1][0]
+
+                    notes = {row_id: (img_path, note) for row_id, img_path, note in batch}
+                    tasks = []
+                    for row_id, img_path, _ in batch:
+                        task = self._make_task(row_id, img_path)
+                        if task is None:
+                            logger.warning(f"找不到圖源，略過: {img_path}")
+                            report["skipped"] += 1
+                        else:
+                            tasks.append(task)
+
+                    # map 依輸入順序回傳，last_id 因此單調遞增
+                    for row_id, data, width, height, error in pool.map(_encode_image, tasks, chunksize=8):
+                        img_path, note = notes[row_id]
+                        if error:
+                            logger.warning(f"圖片轉檔失敗，略過: {img_path} ({error})")
+                            report["failed"] += 1
+                            continue
+
+                        key = f"{row_id:08d}"
+                        if layout == "files":
+                            file_name = f"images/{key}{self.suffix}"
+                            (self.out_dir / file_name).write_bytes(data)
+                        else:
+                            if shard is None:
+                                shard = tarfile.open(self.out_dir / f"shard-{state['shard']:05d}.tar", "w")
+                            for name, payload in ((key + self.suffix, data), (key + ".txt", note.encode("utf-8"))):
+                                info = tarfile.TarInfo(name)
+                                info.size = len(payload)
+                                info.mtime = int(time.time())
+                                shard.addfile(info, io.BytesIO(payload))
+                            file_name = f"shard-{state['shard']:05d}.tar:{key}{self.suffix}"
+                            shard_count += 1
+
+                        self._write_manifest(manifest, {
+                            "file": file_name, "note": note, "source": img_path,
+                            "width": width, "height": height,
+                        })
+                        report["exported"] += 1
+                        report["bytes_written"] += len(data)
+
+                        if shard is not None and shard_count >= self.spec["shard_size"]:
+                            # shard 寫滿才記錄進度；未寫滿的 shard 續傳時會整個重寫
+                            shard.close()
+                            shard, shard_count = None, 0
+                            manifest.flush()
+                            state.update(last_id=row_id, count=resumed_from + report["exported"],
+                                         shard=state["shard"] + 1, manifest_offset=manifest.tell())
+                            self._save_state(state)
+
+                    if layout == "files":
+                        manifest.flush()
+                        state.update(last_id=last_id, count=resumed_from + report["exported"],
+                                     manifest_offset=manifest.tell())
+                        self._save_state(state)
+
+                    elapsed = time.perf_counter() - start
+                    report["elapsed_sec"] = round(elapsed, 2)
+                    report["images_per_sec"] = round(report["exported"] / elapsed, 1) if elapsed else 0.0
+                    logger.info(f"匯出進度: {report}")
+                    if progress:
+                        progress(dict(report))
+
+            # 最後一個未滿的 shard
+            if shard is not None:
+                shard.close()
+                shard = None
+                manifest.flush()
+                state.update(last_id=last_id, count=resumed_from + report["exported"],
+                             shard=state["shard"] + 1, manifest_offset=manifest.tell())
+                self._save_state(state)
+
+        finally:
+            if shard is not None:
+                shard.close()
+            manifest.close()
+
+        elapsed = time.perf_counter() - start
+        report["elapsed_sec"] = round(elapsed, 2)
+        report["images_per_sec"] = round(report["exported"] / elapsed, 1) if elapsed else 0.0
+        report["total_exported"] = resumed_from + report["exported"]
+        logger.info(f"匯出完成: {report}")
+        return report
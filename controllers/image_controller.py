@@ -1,14 +1,39 @@
+import os
 import logging
-from models import ImageRepository, AnnotationDB
-from config.errors import ResourceNotLoadedError
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from models import ImageRepository, ArchiveImageRepository, AnnotationDB, EditJournal, AnnotationStatusIndex
+from controllers.dataset_exporter import DatasetExporter
+from config.errors import AppError, ResourceNotLoadedError, ConflictError, OperationCancelledError
 
 logger = logging.getLogger(__name__)
 
 
 class ImageAnnotationController:
-    def __init__(self, repo: ImageRepository, db: AnnotationDB):
+    # 日誌累積超過此筆數時立即併入 DB
+    JOURNAL_BATCH_SIZE = 50
+    # change feed 每次查詢的列數
+    CHANGE_FEED_BATCH = 1000
+    # 圖片資訊每次寫入 DB 的筆數
+    METADATA_CHUNK_SIZE = 256
+    # 可用於排序的圖片資訊欄位 (None = 檔名順序)
+    SORT_KEYS = (None, "taken_at", "mtime", "file_size", "width", "height")
+
+    def __init__(self, repo: ImageRepository | ArchiveImageRepository, db: AnnotationDB,
+                 journal: EditJournal | None = None):
         self.img_repo = repo
         self.db = db
+        self.journal = journal
+        # 已寫入日誌、尚未併入 DB 的註解 {image_path: note}
+        self._pending = {}
+        # 多人共用：讀取時的版本號 / 編輯開始時的版本號 / 尚未處理的衝突
+        self._versions = {}
+        self._pending_base = {}
+        self._conflicts = {}
+        # change feed 已讀到的全域變更序號
+        self._change_seq = db.get_change_seq()
+        # 註記狀態索引 (第一次導覽查詢時建立，之後隨每次儲存更新)
+        self._status = None
 
         logger.info(f"Controller initialized: ImageRepository and SQLiteDB succeed.")
 
@@ -19,12 +44,31 @@ class ImageAnnotationController:
             "total_count": len(self.img_repo)
         }
 
+    def get_statistics(self) -> dict:
+        # 進度統計 (常數時間，不掃描資料表也不逐張檢查圖片)
+        try:
+            folder_prefix = str(self.img_repo.folder) + os.sep
+            stats = self.db.get_statistics(folder_prefix)
+            repo_total = len(self.img_repo)
+            annotated = min(stats["folder_annotated"], repo_total)
+            return {
+                "success": True,
+                "repo_total": repo_total,
+                "repo_annotated": annotated,
+                "progress": annotated / repo_total if repo_total else 0.0,
+                "db_total": stats["total"],
+                "db_annotated": stats["annotated"],
+                "daily_edits": stats["daily_edits"]
+            }
+        except Exception:
+            logger.exception("Statistics Getting Error.")
+            raise ResourceNotLoadedError()
+
     def get_all_images(self) -> dict:
-        # 取得所有的圖檔路徑
-        imgs = [str(img) for img in self.img_repo.images]
+        # 取得所有的圖檔路徑 (唯讀序列，直接回傳 repository 的索引，不複製)
         return {
             "success": True,
-            "images_list": imgs or ""
+            "images_list": self.img_repo.images or ""
         }
 
     def get_index_image(self, index_1_based: int) -> dict:
@@ -41,28 +85,510 @@ class ImageAnnotationController:
             logger.exception("Image Path Getting Error.")
             raise ResourceNotLoadedError()
 
+    def open_image(self, img_path: str) -> dict:
+        # 由圖源開啟圖片 (資料夾或壓縮檔皆同一介面)
+        try:
+            img = self.img_repo.open(img_path)
+            return {
+                "success": True,
+                "image_path": img_path or "",
+                "image": img
+            }
+        except Exception:
+            logger.exception(f"Image Open Error: img_path/{img_path}")
+            raise ResourceNotLoadedError()
+
+    def get_preview_image(self, img_path: str, size: tuple) -> dict:
+        # 開圖並等比例縮放至 size (寬, 高) 內；可在背景執行緒呼叫 (不存取 DB)
+        try:
+            box_w, box_h = size
+            img = self.img_repo.open(img_path)
+            if img.format == "JPEG":
+                # JPEG 以縮小比例直接解碼 (不小於目標尺寸)，大圖省下大部分解碼時間
+                img.draft("RGB", (box_w, box_h))
+
+            img_ratio = img.width / img.height
+            if img_ratio > box_w / box_h:
+                # 依框寬、調高
+                new_w, new_h = box_w, int(box_w / img_ratio)
+            else:
+                # 調寬、依框高
+                new_w, new_h = int(box_h * img_ratio), box_h
+            img = img.resize((max(new_w, 1), max(new_h, 1)), Image.Resampling.LANCZOS)
+            return {
+                "success": True,
+                "image_path": img_path or "",
+                "image": img
+            }
+        except Exception:
+            logger.exception(f"Image Preview Error: img_path/{img_path}")
+            raise ResourceNotLoadedError()
+
     def get_annotation(self, img_path: str) -> dict:
         # 取得圖片對應的註解
         try:
-            note = self.db.get_annotation(img_path)
+            img_path = str(img_path)
+            if img_path in self._pending:
+                note = self._pending[img_path]
+                version = self._pending_base.get(img_path)
+            else:
+                note, version = self.db.get_annotation_version(img_path)
+                self._versions[img_path] = version
             return {
                 "success": True,
                 "image_path": img_path or "",
-                "annotation": note or ""
+                "annotation": note or "",
+                "version": version
             }
         except Exception:
             logger.exception("Annotation Getting Error.")
             raise ResourceNotLoadedError()
 
     def update_db_annotation(self, img_path: str, note: str) -> dict:
-        # 更新註解
+        # 更新註解 (立即寫入 DB)；版本衝突時拋出 ConflictError 交由 View 處理
         try:
-            self.db.update_note(img_path, note)
+            self._add_pending(str(img_path), note)
+            self._flush_pending()
+            if str(img_path) in self._conflicts:
+                conflict = self._conflicts.pop(str(img_path))
+                raise ConflictError(conflicts={str(img_path): conflict})
             logger.info(f"{img_path} Annotation Update 成功！")
             return {
                 "success": True,
                 "img_path": img_path or ""
             }
+        except ConflictError:
+            raise
         except Exception:
             logger.exception(f"Annotation Update Error: img_path/{img_path}")
             raise ResourceNotLoadedError()
+
+    # ========= 註記狀態導覽(Status Navigation) =========
+    def _status_index(self):
+        # 只在第一次使用時查詢一次已註記路徑 (索引範圍查詢)
+        if self._status is None:
+            folder_prefix = str(self.img_repo.folder) + os.sep
+            annotated = (self.img_repo.index_of(path) for path in self.db.get_annotated_paths(folder_prefix))
+            self._status = AnnotationStatusIndex(len(self.img_repo), [i for i in annotated if i is not None])
+            for path, note in self._pending.items():
+                self._set_status(path, note)
+        return self._status
+
+    def _set_status(self, img_path, note):
+        if self._status is None:
+            return
+        index = self.img_repo.index_of(img_path)
+        if index is not None:
+            self._status.set(index, bool(note))
+
+    def get_annotation_status(self) -> dict:
+        # 每張圖片的註記狀態 (bytes，1 = 已註記)，依圖片索引順序
+        try:
+            status = self._status_index()
+            return {
+                "success": True,
+                "flags": bytes(status.flags),
+                "annotated_count": status.annotated_count()
+            }
+        except Exception:
+            logger.exception("Annotation Status Getting Error.")
+            raise ResourceNotLoadedError()
+
+    def get_image_status(self, index_1_based: int) -> dict:
+        # 單張圖片的註記狀態
+        try:
+            return {
+                "success": True,
+                "annotated": self._status_index().is_annotated(index_1_based - 1)
+            }
+        except Exception:
+            logger.exception("Image Status Getting Error.")
+            raise ResourceNotLoadedError()
+
+    def find_image(self, index_1_based: int, forward: bool = True, annotated: bool = False) -> dict:
+        # 由目前圖片往前/後找第一張 (未)註記的圖片，找不到時 index_1_based 為 None
+        try:
+            status = self._status_index()
+            if forward:
+                found = status.find_next(index_1_based - 1, annotated)
+            else:
+                found = status.find_prev(index_1_based - 1, annotated)
+            return {
+                "success": True,
+                "index_1_based": found + 1 if found is not None else None
+            }
+        except Exception:
+            logger.exception("Image Finding Error.")
+            raise ResourceNotLoadedError()
+
+    # ========= 自動儲存日誌(Journal) =========
+    def _flush_pending(self):
+        # 先寫 DB 再清日誌：中途當機時重播日誌結果相同
+        # 衝突的列不寫入，保留於 _conflicts 等待 View 決定覆寫或放棄
+        if not self._pending:
+            return 0
+        versions, conflicts = self.db.update_notes(self._pending, self._pending_base)
+        self._versions.update(versions)
+        self._conflicts.update(conflicts)
+        self._pending.clear()
+        self._pending_base.clear()
+        if self.journal:
+            self.journal.clear()
+        return len(versions)
+
+    def _add_pending(self, img_path, note, base_version=None):
+        # 同一張圖多次編輯只保留最後內容，版本號以第一次編輯時為準
+        if img_path not in self._pending_base:
+            self._pending_base[img_path] = base_version if base_version is not None else self._versions.get(img_path)
+        self._pending[img_path] = note
+        self._set_status(img_path, note)
+        return self._pending_base[img_path]
+
+    def journal_note(self, img_path: str, note: str) -> dict:
+        # 自動儲存：快照寫入日誌，累積到一定筆數才併入 DB
+        try:
+            base_version = self._add_pending(str(img_path), note)
+            if self.journal:
+                self.journal.append(img_path, note, base_version)
+            if not self.journal or len(self._pending) >= self.JOURNAL_BATCH_SIZE:
+                self._flush_pending()
+            return {
+                "success": True,
+                "img_path": img_path or "",
+                "pending_count": len(self._pending)
+            }
+        except Exception:
+            logger.exception(f"Annotation Journal Error: img_path/{img_path}")
+            raise ResourceNotLoadedError()
+
+    def flush_journal(self) -> dict:
+        # 將日誌中尚未入庫的註解併入 DB
+        try:
+            count = self._flush_pending()
+            if count:
+                logger.info(f"Journal flushed: {count} annotations.")
+            return {
+                "success": True,
+                "flushed_count": count
+            }
+        except Exception:
+            logger.exception("Annotation Journal Flush Error.")
+            raise ResourceNotLoadedError()
+
+    def recover_journal(self) -> dict:
+        # 啟動時重播上次異常結束留下的日誌
+        try:
+            if not self.journal:
+                return {"success": True, "recovered_count": 0}
+            for img_path, note, version in self.journal.read():
+                self._add_pending(img_path, note, version)
+            count = self._flush_pending()
+            if count:
+                logger.warning(f"Journal recovered: {count} annotations.")
+            return {
+                "success": True,
+                "recovered_count": count
+            }
+        except Exception:
+            logger.exception("Annotation Journal Recover Error.")
+            raise ResourceNotLoadedError()
+
+    # ========= 批次註解(Batch) =========
+    BATCH_MODES = ("apply", "append", "replace", "clear")
+
+    @staticmethod
+    def _batch_transform(mode, text, find):
+        # 依模式產生 old_note => new_note 的轉換
+        if mode == "apply":
+            return lambda old: text
+        if mode == "append":
+            return lambda old: f"{old}\n{text}" if old else text
+        if mode == "replace":
+            if not find:
+                raise AppError("取代模式需要指定搜尋文字")
+            return lambda old: old.replace(find, text)
+        if mode == "clear":
+            return lambda old: ""
+        raise AppError(f"未知的批次模式: {mode}")
+
+    def batch_annotate(self, img_paths: list, mode: str, text: str = "", find: str = "",
+                       progress=None, cancel=None) -> dict:
+        """
+        Use case:
+            - 對多張圖片套用同一個註解操作，單一交易寫入
+            - mode: apply(覆寫) / append(附加) / replace(find => text) / clear(清空)
+            - progress(done, total) 回報進度，cancel() 回傳 True 時取消 (不寫入任何資料)
+        """
+        transform = self._batch_transform(mode, text, find)
+        try:
+            # 先併入尚未入庫的編輯，避免之後覆蓋批次結果
+            self._flush_pending()
+            changed = self.db.batch_update_notes(img_paths, transform, progress, cancel)
+            for path, (version, note) in changed.items():
+                self._versions[path] = version
+                self._set_status(path, note)
+            logger.info(f"Batch annotate [{mode}]: {len(changed)}/{len(img_paths)} changed.")
+            return {
+                "success": True,
+                "total_count": len(img_paths),
+                "changed_count": len(changed)
+            }
+        except OperationCancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Batch Annotate Error: mode/{mode}")
+            raise ResourceNotLoadedError()
+
+    # ========= 多人共用(Concurrency) =========
+    def pop_conflicts(self) -> dict:
+        # 取出背景寫入時發生的版本衝突 {image_path: {"local_note", "remote_note", "remote_version"}}
+        conflicts, self._conflicts = self._conflicts, {}
+        return {
+            "success": True,
+            "conflicts": conflicts
+        }
+
+    def resolve_conflict(self, img_path: str, note: str | None = None) -> dict:
+        # note=None: 採用他人的版本；否則以 note 強制覆寫
+        try:
+            img_path = str(img_path)
+            if note is None:
+                note, version = self.db.get_annotation_version(img_path)
+            else:
+                version = self.db.update_note(img_path, note)
+            self._versions[img_path] = version
+            self._set_status(img_path, note)
+            return {
+                "success": True,
+                "img_path": img_path,
+                "version": version
+            }
+        except Exception:
+            logger.exception(f"Conflict Resolve Error: img_path/{img_path}")
+            raise ResourceNotLoadedError()
+
+    def poll_changes(self) -> dict:
+        # change feed：只讀取上次之後其他用戶端變更的列
+        try:
+            changed = []
+            while True:
+                rows = self.db.get_changes_since(self._change_seq, self.CHANGE_FEED_BATCH)
+                for row in rows:
+                    self._change_seq = row["change_seq"]
+                    path = row["image_path"]
+                    # 自己寫入的版本已知；本機尚有未入庫編輯者留待併入時做衝突檢查
+                    if self._versions.get(path) == row["version"] or path in self._pending:
+                        continue
+                    self._versions[path] = row["version"]
+                    self._set_status(path, row["note"])
+                    changed.append(path)
+                if len(rows) < self.CHANGE_FEED_BATCH:
+                    break
+            return {
+                "success": True,
+                "changed_paths": changed
+            }
+        except Exception:
+            logger.exception("Change Feed Polling Error.")
+            raise ResourceNotLoadedError()
+
+    # ========= 區域註解(Region) =========
+    def add_region(self, img_path: str, kind: str, points: list, label: str = "") -> dict:
+        # 新增區域註解 (座標為原圖像素座標)
+        try:
+            region_id = self.db.add_region(img_path, kind, points, label)
+            # 新增區域可能順帶建立 image_data 列，讀取時記錄的「尚無資料」版本需更新
+            _, version = self.db.get_annotation_version(img_path)
+            if self._versions.get(str(img_path)) == 0:
+                self._versions[str(img_path)] = version
+            if self._pending_base.get(str(img_path)) == 0:
+                self._pending_base[str(img_path)] = version
+            return {
+                "success": True,
+                "img_path": img_path or "",
+                "region_id": region_id
+            }
+        except Exception:
+            logger.exception(f"Region Add Error: img_path/{img_path}")
+            raise ResourceNotLoadedError()
+
+    def delete_region(self, region_id: int) -> dict:
+        # 刪除區域註解
+        try:
+            self.db.delete_region(region_id)
+            return {
+                "success": True,
+                "region_id": region_id
+            }
+        except Exception:
+            logger.exception(f"Region Delete Error: region_id/{region_id}")
+            raise ResourceNotLoadedError()
+
+    def get_regions_in_view(self, img_path: str, x0: float, y0: float, x1: float, y1: float) -> dict:
+        # 取得與可視範圍 (原圖座標) 相交的區域
+        try:
+            regions = self.db.get_regions_in_rect(img_path, x0, y0, x1, y1)
+            return {
+                "success": True,
+                "img_path": img_path or "",
+                "regions": regions
+            }
+        except Exception:
+            logger.exception(f"Region Query Error: img_path/{img_path}")
+            raise ResourceNotLoadedError()
+
+    def hit_test_region(self, img_path: str, x: float, y: float) -> dict:
+        # 滑鼠命中測試，regions[0] 為最上層 (面積最小) 的區域
+        try:
+            regions = self.db.hit_test_region(img_path, x, y)
+            return {
+                "success": True,
+                "img_path": img_path or "",
+                "regions": regions
+            }
+        except Exception:
+            logger.exception(f"Region Hit Test Error: img_path/{img_path}")
+            raise ResourceNotLoadedError()
+
+    # ========= 圖片資訊(Metadata) =========
+    def _read_metadata(self, img_path):
+        # 背景執行緒：單張失敗只記錄，不中斷整批
+        try:
+            return self.img_repo.read_metadata(img_path)
+        except Exception:
+            logger.warning(f"圖片資訊讀取失敗，略過: {img_path}")
+            return None
+
+    def index_metadata(self, progress=None, cancel=None, workers=None) -> dict:
+        """
+        Use case:
+            - 只讀檔頭建立圖片資訊 (尺寸 / 格式 / 檔案大小 / 修改時間 / EXIF) 並快取於 DB
+            - 已快取且檔案大小、修改時間未變的圖片略過
+            - 以 thread pool 平行讀檔頭 (I/O 為主)，每批寫入一次 DB
+            - progress(done, total) 回報進度，cancel() 回傳 True 時於批次之間停止 (已寫入的保留)
+        """
+        try:
+            folder_prefix = str(self.img_repo.folder) + os.sep
+            cached = self.db.get_metadata_stamps(folder_prefix)
+            todo, failed = [], 0
+            for path in self.img_repo.images:
+                try:
+                    if cached.get(path) != self.img_repo.stat(path):
+                        todo.append(path)
+                except Exception:
+                    # 檔案已被移除等情況，略過
+                    failed += 1
+            del cached
+
+            total = len(todo)
+            indexed = 0
+            with ThreadPoolExecutor(max_workers=workers or min(8, (os.cpu_count() or 1) * 2)) as pool:
+                for start in range(0, total, self.METADATA_CHUNK_SIZE):
+                    if cancel and cancel():
+                        raise OperationCancelledError()
+                    chunk = todo[start:start + self.METADATA_CHUNK_SIZE]
+                    rows = {}
+                    for path, meta in zip(chunk, pool.map(self._read_metadata, chunk)):
+                        if meta is None:
+                            failed += 1
+                        else:
+                            rows[path] = meta
+                    if rows:
+                        self.db.upsert_metadata(folder_prefix, rows)
+                    indexed += len(rows)
+                    if progress:
+                        progress(start + len(chunk), total)
+
+            logger.info(f"Metadata indexed: {indexed} updated, {failed} failed, {len(self.img_repo) - total} cached.")
+            return {
+                "success": True,
+                "total_count": len(self.img_repo),
+                "indexed_count": indexed,
+                "failed_count": failed
+            }
+        except OperationCancelledError:
+            raise
+        except Exception:
+            logger.exception("Metadata Index Error.")
+            raise ResourceNotLoadedError()
+
+    def get_image_metadata(self, img_path: str) -> dict:
+        # 取得單張圖片資訊 (未建立時為 None)
+        try:
+            return {
+                "success": True,
+                "metadata": self.db.get_metadata(img_path)
+            }
+        except Exception:
+            logger.exception(f"Image Metadata Getting Error: img_path/{img_path}")
+            raise ResourceNotLoadedError()
+
+    def get_metadata_options(self) -> dict:
+        # 篩選下拉選單的選項：目前圖源出現過的格式與相機
+        try:
+            folder_prefix = str(self.img_repo.folder) + os.sep
+            return {
+                "success": True,
+                "formats": self.db.get_metadata_values("format", folder_prefix),
+                "cameras": self.db.get_metadata_values("camera", folder_prefix)
+            }
+        except Exception:
+            logger.exception("Metadata Options Getting Error.")
+            raise ResourceNotLoadedError()
+
+    def get_sorted_images(self, sort_by: str | None = None, descending: bool = False,
+                          filters: dict | None = None) -> dict:
+        """
+        Use case:
+            - 依圖片資訊排序 / 篩選，回傳圖片索引 (0-based) 清單，供清單顯示順序使用
+            - sort_by=None 且無篩選時即為原本的檔名順序，不查詢 DB
+            - 有篩選時只含已建立圖片資訊且符合條件的圖片；只排序時尚未建立資訊的圖片排在最後
+        """
+        if sort_by not in self.SORT_KEYS:
+            raise AppError(f"不支援的排序欄位: {sort_by}")
+        filters = {k: v for k, v in (filters or {}).items() if v not in (None, "")}
+        try:
+            total = len(self.img_repo)
+            if sort_by is None and not filters:
+                indices = range(total - 1, -1, -1) if descending else range(total)
+                return {
+                    "success": True,
+                    "index_list": list(indices)
+                }
+
+            folder_prefix = str(self.img_repo.folder) + os.sep
+            paths = self.db.query_image_paths(folder_prefix, sort_by, descending, filters)
+            seen = bytearray(total)
+            indices = []
+            for path in paths:
+                index = self.img_repo.index_of(path)
+                if index is not None:
+                    seen[index] = 1
+                    indices.append(index)
+            if not filters:
+                indices.extend(i for i in range(total) if not seen[i])
+            return {
+                "success": True,
+                "index_list": indices
+            }
+        except Exception:
+            logger.exception(f"Sorted Images Getting Error: sort_by/{sort_by}")
+            raise ResourceNotLoadedError()
+
+    # ========= 資料集匯出(Export) =========
+    def export_dataset(self, out_dir: str, progress=None, cancel=None, **options) -> dict:
+        # 匯出已註記圖片為訓練資料集，options 見 DatasetExporter
+        try:
+            self._flush_pending()
+            exporter = DatasetExporter(self.db, out_dir, self.img_repo, **options)
+            report = exporter.run(progress, cancel)
+            return {
+                "success": True,
+                "out_dir": str(out_dir),
+                "report": report
+            }
+        except (OperationCancelledError, AppError):
+            raise
+        except Exception:
+            logger.exception(f"Dataset Export Error: out_dir/{out_dir}")
+            raise ResourceNotLoadedError()
@@ -1,11 +1,78 @@
+import argparse
 import config.logging_config
-from views import MainWindow
 
 
 def main():
+    from views import MainWindow
+
     app = MainWindow()
     app.mainloop()
 
 
+def export_main(args):
+    # 命令列匯出訓練資料集 (不需開啟 GUI)
+    from models import AnnotationDB, ArchiveImageRepository
+    from controllers import DatasetExporter
+
+    db = AnnotationDB(args.db)
+    repo = ArchiveImageRepository(args.archive, cache_dir=db.db_path.parent) if args.archive else None
+    exporter = DatasetExporter(
+        db, args.out, repo,
+        max_size=tuple(args.max_size) if args.max_size else None,
+        image_format=args.format,
+        quality=args.quality,
+        layout=args.layout,
+        shard_size=args.shard_size,
+        manifest=args.manifest,
+        workers=args.workers,
+    )
+    report = exporter.run(progress=lambda r: print(
+        f"\r已匯出 {r['resumed_from'] + r['exported']} 張  {r['images_per_sec']} 張/秒", end="", flush=True
+    ))
+    print()
+    for key, value in report.items():
+        print(f"{key:>16}: {value}")
+
+
+def stats_main(args):
+    # 命令列查詢多個專案資料庫的註記進度 (讀計數表，不掃描資料表)
+    from models import AnnotationDB
+
+    print(f"{'database':<40} {'total':>10} {'annotated':>10} {'progress':>9} {'today':>7}")
+    for db_path in args.db:
+        stats = AnnotationDB(db_path).get_statistics(days=1)
+        progress = stats["annotated"] / stats["total"] if stats["total"] else 0.0
+        today = sum(stats["daily_edits"].values())
+        print(f"{db_path:<40} {stats['total']:>10} {stats['annotated']:>10} {progress:>9.1%} {today:>7}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Image Annotation Tool")
+    sub = parser.add_subparsers(dest="command")
+
+    p_export = sub.add_parser("export", help="匯出已註記圖片為訓練資料集")
+    p_export.add_argument("--db", required=True, help="註解資料庫 (.db)")
+    p_export.add_argument("--out", required=True, help="輸出資料夾 (相同參數重跑可續傳)")
+    p_export.add_argument("--archive", help="圖片來源為 zip/tar 壓縮檔時指定")
+    p_export.add_argument("--max-size", type=int, nargs=2, metavar=("W", "H"), help="等比例縮圖上限")
+    p_export.add_argument("--format", default="JPEG", choices=["JPEG", "PNG", "WEBP"])
+    p_export.add_argument("--quality", type=int, default=90)
+    p_export.add_argument("--layout", default="files", choices=["files", "tar"])
+    p_export.add_argument("--shard-size", type=int, default=1000, help="tar 模式每個 shard 的張數")
+    p_export.add_argument("--manifest", default="jsonl", choices=["jsonl", "csv"])
+    p_export.add_argument("--workers", type=int, help="process 數量 (預設 CPU 核心數)")
+    p_export.set_defaults(func=export_main)
+
+    p_stats = sub.add_parser("stats", help="查詢資料庫註記進度")
+    p_stats.add_argument("db", nargs="+", help="一或多個註解資料庫 (.db)")
+    p_stats.set_defaults(func=stats_main)
+
+    return parser
+
+
 if __name__ == "__main__":
-    main()
+    args = build_parser().parse_args()
+    if args.command:
+        args.func(args)
+    else:
+        main()
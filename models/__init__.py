@@ -1,3 +1,8 @@
 
 from .annotation_db import AnnotationDB
 from .image_repository import ImageRepository
+from .archive_repository import ArchiveImageRepository
+from .edit_journal import EditJournal
+from .status_index import AnnotationStatusIndex
+from .image_index import ImageIndex
+from .db_backup import DatabaseBackup
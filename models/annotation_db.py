@@ -3,19 +3,49 @@
  - 資料表總筆數取得 select
  - 取得 image 資料 select、insert
  - 更新 image 資料 update
+ - 區域註解 (bbox / polygon) 與 R*Tree 空間索引
+ - 進度統計：trigger 維護的計數表 (總數 / 已註記 / 各資料夾 / 每日編輯)，O(1) 讀取
+ - 多人共用：WAL、busy timeout + 退避重試、版本號 compare-and-swap、變更序號 (change feed)
+ - 圖片資訊快取 (尺寸 / 格式 / EXIF)：排序與篩選走索引查詢，不需開圖
  - assert、try/except、logging 預防性錯誤、系統日誌
 """
 
+import json
+import time
+import random
 import sqlite3
 import logging
 from pathlib import Path
-from config.errors import PathError, DBError
+from config.errors import PathError, DBError, ConflictError, OperationCancelledError
+from models.image_metadata import METADATA_FIELDS
 
 logger = logging.getLogger(__name__)
 
+# 等待其他連線釋放鎖的秒數 (sqlite busy timeout)
+BUSY_TIMEOUT = 5.0
+SHARED_BUSY_TIMEOUT = 30.0
+# 批次更新每次讀取/回報進度的筆數
+BATCH_CHUNK_SIZE = 500
+# busy timeout 用盡後的重試次數與起始退避秒數 (指數退避 + 隨機抖動)
+WRITE_RETRIES = 6
+RETRY_BASE_DELAY = 0.05
+# image_meta 可排序 / 可篩選的欄位 (各自有索引)
+METADATA_SORT_COLUMNS = ("taken_at", "mtime", "file_size", "width", "height")
+METADATA_FILTER_COLUMNS = ("format", "camera")
+
+
+def _sql_folder(col):
+    # SQLite 沒有 dirname：rtrim 掉路徑中「非分隔符號」的字元，剩下資料夾 (含結尾分隔符號)
+    return f"rtrim({col}, replace(replace({col}, '/', ''), '\\', ''))"
+
+
+def _sql_annotated(col):
+    # 已註記 = note 非空，結果為 0 / 1
+    return f"(COALESCE({col}, '') != '')"
+
 
 class AnnotationDB:
-    def __init__(self, db_path):
+    def __init__(self, db_path, shared=False):
         # 初始化
         try:
             db_path = Path(db_path)
@@ -30,17 +60,53 @@ class AnnotationDB:
             raise PathError(f"{db_path} 非資料庫檔案。(目前僅用 SQLite 的 .db 格式)")
 
         self.db_path = db_path
+        # shared=True: 多位標註人員共用同一個 .db
+        # ☆ WAL 需要各連線能共用 -shm 檔，只適用同一台主機 (或支援共享記憶體對映的檔案系統)
+        self.shared = shared
+        self.busy_timeout = SHARED_BUSY_TIMEOUT if shared else BUSY_TIMEOUT
         self._init_db()
 
     def _connect(self):
         # DB 連線
-        return sqlite3.connect(self.db_path)
+        return sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+
+    @staticmethod
+    def _is_busy(exc):
+        msg = str(exc).lower()
+        return "locked" in msg or "busy" in msg
+
+    def _write(self, fn):
+        # 寫入交易：BEGIN IMMEDIATE 先取得寫入鎖，鎖衝突時指數退避重試
+        for attempt in range(WRITE_RETRIES + 1):
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                result = fn(conn)
+                conn.commit()
+                return result
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                if not self._is_busy(e) or attempt == WRITE_RETRIES:
+                    raise
+                delay = RETRY_BASE_DELAY * (2 ** attempt) * (0.5 + random.random())
+                logger.warning(f"資料庫忙碌，{delay:.2f}s 後重試 ({attempt + 1}/{WRITE_RETRIES})")
+                time.sleep(delay)
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
 
     def _init_db(self):
         # DB 初始化
         # ☆ 初始化的嚴謹設定中，雖然可以判斷是否存在，但仍舊必要執行，確保初始化的完整性！
         try:
             with self._connect() as conn:
+                if self.shared:
+                    # journal_mode 寫入資料庫檔，之後所有連線皆為 WAL
+                    (mode, ) = conn.execute("PRAGMA journal_mode=WAL").fetchone()
+                    logger.info(f"共用模式 journal_mode={mode}")
+
                 sql = """
                 SELECT name FROM sqlite_master 
                 WHERE type='table' AND name='image_data'
@@ -55,6 +121,34 @@ class AnnotationDB:
                 )
                 """
                 conn.execute(sql)
+                self._init_versioning(conn)
+
+                # 區域註解：image_region 存內容，image_region_rtree 為空間索引
+                # rtree 第一維放 image_data.id，讓查詢只落在同一張圖的區域
+                sql = """
+                CREATE TABLE IF NOT EXISTS image_region (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    image_id INTEGER NOT NULL REFERENCES image_data(id),
+                    kind TEXT NOT NULL,
+                    points TEXT NOT NULL,
+                    label TEXT
+                )
+                """
+                conn.execute(sql)
+
+                sql = """
+                CREATE VIRTUAL TABLE IF NOT EXISTS image_region_rtree USING rtree(
+                    id,
+                    min_img, max_img,
+                    min_x, max_x,
+                    min_y, max_y
+                )
+                """
+                conn.execute(sql)
+                self._init_metadata(conn)
+
+            # 統計表需與既有資料一次對齊，在寫入交易內建立
+            self._write(self._init_stats)
 
             if exists:
                 logger.info("資料表 image_data 已存在")
@@ -65,13 +159,202 @@ class AnnotationDB:
             logger.exception("資料庫初始化/資料表建立失敗")
             raise DBError()
 
+    def _init_metadata(self, conn):
+        # 圖片資訊快取：由圖源解析檔頭後寫入，image_path 與 image_data 相同
+        # source = 圖源路徑前綴 (資料夾 / 壓縮檔)，查詢以等值條件限定圖源，排序才能直接走索引
+        sql = """
+        CREATE TABLE IF NOT EXISTS image_meta (
+            image_path TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            format TEXT,
+            file_size INTEGER,
+            mtime REAL,
+            taken_at TEXT,
+            orientation INTEGER,
+            camera TEXT
+        )
+        """
+        conn.execute(sql)
+        # 排序 / 篩選欄位各一個 (source, 欄位, image_path) 索引，image_path 作為同值時的次序
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_image_meta_source ON image_meta(source, image_path)")
+        for col in METADATA_SORT_COLUMNS + METADATA_FILTER_COLUMNS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_image_meta_{col} ON image_meta(source, {col}, image_path)")
+
+    def _init_versioning(self, conn):
+        # 版本號 / 變更序號：由 trigger 維護，所有寫入路徑 (含其他程式) 一致
+        #  - version: 每列各自遞增，用於 compare-and-swap 更新
+        #  - change_seq: 全域遞增，其他用戶端只需讀取 change_seq > 上次序號 的列
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(image_data)")}
+        if "version" not in columns:
+            conn.execute("ALTER TABLE image_data ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            conn.execute("UPDATE image_data SET version = 1")
+            logger.info("資料表 image_data 新增 version 欄位")
+        if "updated_at" not in columns:
+            conn.execute("ALTER TABLE image_data ADD COLUMN updated_at REAL")
+        if "change_seq" not in columns:
+            conn.execute("ALTER TABLE image_data ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+
+        sql = """
+        CREATE TABLE IF NOT EXISTS change_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            seq INTEGER NOT NULL
+        )
+        """
+        conn.execute(sql)
+        conn.execute("INSERT OR IGNORE INTO change_counter (id, seq) VALUES (1, 0)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_image_data_change_seq ON image_data(change_seq)")
+
+        # 觸發器內的 UPDATE 不含 note 欄位，不會再次觸發 UPDATE OF note
+        sql = """
+        CREATE TRIGGER IF NOT EXISTS trg_image_data_version_insert
+        AFTER INSERT ON image_data
+        BEGIN
+            UPDATE change_counter SET seq = seq + 1 WHERE id = 1;
+            UPDATE image_data
+            SET version = 1,
+                updated_at = (julianday('now') - 2440587.5) * 86400.0,
+                change_seq = (SELECT seq FROM change_counter WHERE id = 1)
+            WHERE id = NEW.id;
+        END
+        """
+        conn.execute(sql)
+        sql = """
+        CREATE TRIGGER IF NOT EXISTS trg_image_data_version_update
+        AFTER UPDATE OF note ON image_data
+        BEGIN
+            UPDATE change_counter SET seq = seq + 1 WHERE id = 1;
+            UPDATE image_data
+            SET version = OLD.version + 1,
+                updated_at = (julianday('now') - 2440587.5) * 86400.0,
+                change_seq = (SELECT seq FROM change_counter WHERE id = 1)
+            WHERE id = NEW.id;
+        END
+        """
+        conn.execute(sql)
+
+    def _init_stats(self, conn):
+        # 進度統計：由 trigger 在每次寫入時增減，讀取不需掃描 image_data
+        #  - stats_total: 總筆數 / 已註記筆數 (單列)
+        #  - stats_folder: 各資料夾 (路徑最後一個分隔符號之前，含分隔符號) 的總數 / 已註記數
+        #  - stats_daily: 每日註解編輯次數 (本機日期)
+        exists = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='stats_total'"
+        ).fetchone() is not None
+
+        sql = """
+        CREATE TABLE IF NOT EXISTS stats_total (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total INTEGER NOT NULL,
+            annotated INTEGER NOT NULL
+        )
+        """
+        conn.execute(sql)
+        sql = """
+        CREATE TABLE IF NOT EXISTS stats_folder (
+            folder TEXT PRIMARY KEY,
+            total INTEGER NOT NULL,
+            annotated INTEGER NOT NULL
+        )
+        """
+        conn.execute(sql)
+        sql = """
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            day TEXT PRIMARY KEY,
+            edits INTEGER NOT NULL
+        )
+        """
+        conn.execute(sql)
+
+        if not exists:
+            # 既有資料庫：只在第一次建立統計表時完整掃描一次
+            sql = f"""
+            INSERT INTO stats_total (id, total, annotated)
+            SELECT 1, COUNT(*), COALESCE(SUM({_sql_annotated('note')}), 0)
+            FROM image_data
+            """
+            conn.execute(sql)
+            sql = f"""
+            INSERT INTO stats_folder (folder, total, annotated)
+            SELECT {_sql_folder('image_path')}, COUNT(*), SUM({_sql_annotated('note')})
+            FROM image_data
+            GROUP BY 1
+            """
+            conn.execute(sql)
+            logger.info("統計表已建立並完成初始計數")
+
+        sql = f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_insert
+        AFTER INSERT ON image_data
+        BEGIN
+            UPDATE stats_total
+            SET total = total + 1, annotated = annotated + {_sql_annotated('NEW.note')}
+            WHERE id = 1;
+            INSERT INTO stats_folder (folder, total, annotated)
+                VALUES ({_sql_folder('NEW.image_path')}, 1, {_sql_annotated('NEW.note')})
+            ON CONFLICT(folder) DO UPDATE
+                SET total = total + 1, annotated = annotated + excluded.annotated;
+        END
+        """
+        conn.execute(sql)
+        sql = f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_update
+        AFTER UPDATE OF note ON image_data
+        WHEN {_sql_annotated('OLD.note')} != {_sql_annotated('NEW.note')}
+        BEGIN
+            UPDATE stats_total
+            SET annotated = annotated + {_sql_annotated('NEW.note')} - {_sql_annotated('OLD.note')}
+            WHERE id = 1;
+            UPDATE stats_folder
+            SET annotated = annotated + {_sql_annotated('NEW.note')} - {_sql_annotated('OLD.note')}
+            WHERE folder = {_sql_folder('NEW.image_path')};
+        END
+        """
+        conn.execute(sql)
+        sql = f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_delete
+        AFTER DELETE ON image_data
+        BEGIN
+            UPDATE stats_total
+            SET total = total - 1, annotated = annotated - {_sql_annotated('OLD.note')}
+            WHERE id = 1;
+            UPDATE stats_folder
+            SET total = total - 1, annotated = annotated - {_sql_annotated('OLD.note')}
+            WHERE folder = {_sql_folder('OLD.image_path')};
+        END
+        """
+        conn.execute(sql)
+        # 每日編輯次數：新增有內容的註解、或註解內容有變更
+        sql = f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stats_daily_insert
+        AFTER INSERT ON image_data
+        WHEN {_sql_annotated('NEW.note')}
+        BEGIN
+            INSERT INTO stats_daily (day, edits) VALUES (date('now', 'localtime'), 1)
+            ON CONFLICT(day) DO UPDATE SET edits = edits + 1;
+        END
+        """
+        conn.execute(sql)
+        sql = """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_daily_update
+        AFTER UPDATE OF note ON image_data
+        WHEN OLD.note IS NOT NEW.note
+        BEGIN
+            INSERT INTO stats_daily (day, edits) VALUES (date('now', 'localtime'), 1)
+            ON CONFLICT(day) DO UPDATE SET edits = edits + 1;
+        END
+        """
+        conn.execute(sql)
+
     def get_total_count(self):
-        # 取得目前資料表總數
+        # 取得目前資料表總數 (讀 stats_total，不做 COUNT(*))
         try:
             with self._connect() as conn:
                 sql = """
-                SELECT COUNT(*)
-                FROM image_data
+                SELECT total
+                FROM stats_total
+                WHERE id = 1
                 """
                 (count, ) = conn.execute(sql).fetchone()
 
@@ -81,6 +364,43 @@ class AnnotationDB:
             logger.exception("取得總筆數失敗")
             raise DBError()
 
+    def get_statistics(self, folder_prefix=None, days=7):
+        # 進度統計，全部由計數表讀取 (與資料量無關)
+        #  - folder_prefix: 只統計此路徑前綴下的資料夾 (含子資料夾)，以主鍵範圍查詢
+        try:
+            with self._connect() as conn:
+                sql = """
+                SELECT total, annotated
+                FROM stats_total
+                WHERE id = 1
+                """
+                total, annotated = conn.execute(sql).fetchone()
+
+                stats = {"total": total, "annotated": annotated}
+                if folder_prefix is not None:
+                    sql = """
+                    SELECT COALESCE(SUM(total), 0), COALESCE(SUM(annotated), 0)
+                    FROM stats_folder
+                    WHERE folder >= ? AND folder < ?
+                    """
+                    prefix = str(folder_prefix)
+                    folder_total, folder_annotated = conn.execute(sql, (prefix, prefix + "\U0010ffff")).fetchone()
+                    stats.update(folder_total=folder_total, folder_annotated=folder_annotated)
+
+                sql = """
+                SELECT day, edits
+                FROM stats_daily
+                WHERE day >= date('now', 'localtime', ?)
+                ORDER BY day
+                """
+                stats["daily_edits"] = dict(conn.execute(sql, (f"-{days - 1} days", )).fetchall())
+
+            return stats
+
+        except Exception:
+            logger.exception("取得統計資料失敗")
+            raise DBError()
+
     def get_by_index(self, index):
         # 取得一筆資料
         # 這是 debug / admin 用 API
@@ -120,34 +440,527 @@ class AnnotationDB:
             logger.exception("註解取得失敗")
             raise DBError()
 
-    def update_note(self, img_path, note):
-        # 更新註解
+    def get_annotation_version(self, img_path):
+        # 依圖片路徑取得 (註解, 版本號)；尚無資料時版本號為 0
         try:
+            img_path = str(img_path)
+
             with self._connect() as conn:
                 sql = """
-                SELECT *
+                SELECT note, version
                 FROM image_data
                 WHERE image_path = ?
                 """
                 row = conn.execute(sql, (img_path, )).fetchone()
-                if not row:
-                    sql = """
-                    INSERT INTO image_data (image_path, note)
-                        VALUES (?, ?)
+                return (row[0], row[1]) if row else (None, 0)
+
+        except Exception:
+            logger.exception("註解/版本取得失敗")
+            raise DBError()
+
+    @staticmethod
+    def _cas_note(conn, img_path, note, expected_version=None):
+        # compare-and-swap 寫入一筆註解，成功回傳新版本號，版本不符回傳 None
+        #  - expected_version=None: 不檢查版本，直接覆寫
+        #  - expected_version=0: 讀取時尚無資料，只允許新增
+        if expected_version is None:
+            sql = """
+            INSERT INTO image_data (image_path, note)
+                VALUES (?, ?)
+            ON CONFLICT(image_path) DO UPDATE SET note = excluded.note
+            """
+            conn.execute(sql, (img_path, note))
+        elif expected_version == 0:
+            sql = """
+            INSERT OR IGNORE INTO image_data (image_path, note)
+                VALUES (?, ?)
+            """
+            if conn.execute(sql, (img_path, note)).rowcount == 0:
+                return None
+        else:
+            sql = """
+            UPDATE image_data
+            SET note = ?
+            WHERE image_path = ? AND version = ?
+            """
+            if conn.execute(sql, (note, img_path, expected_version)).rowcount == 0:
+                return None
+
+        sql = """
+        SELECT version
+        FROM image_data
+        WHERE image_path = ?
+        """
+        (version, ) = conn.execute(sql, (img_path, )).fetchone()
+        return version
+
+    @staticmethod
+    def _conflict_info(conn, img_path, note):
+        sql = """
+        SELECT note, version
+        FROM image_data
+        WHERE image_path = ?
+        """
+        row = conn.execute(sql, (img_path, )).fetchone()
+        return {
+            "local_note": note,
+            "remote_note": row[0] if row else None,
+            "remote_version": row[1] if row else 0,
+        }
+
+    def update_note(self, img_path, note, expected_version=None):
+        # 更新註解，回傳新版本號；expected_version 與資料庫不符時拋出 ConflictError
+        img_path = str(img_path)
+
+        def write(conn):
+            version = self._cas_note(conn, img_path, note, expected_version)
+            if version is None:
+                return None, self._conflict_info(conn, img_path, note)
+            return version, None
+
+        try:
+            version, conflict = self._write(write)
+        except Exception:
+            logger.exception("更新 note 失敗")
+            raise DBError()
+
+        if conflict:
+            logger.warning(f"[image_data] {img_path} 版本衝突: 預期 {expected_version}, 目前 {conflict['remote_version']}")
+            raise ConflictError(conflicts={img_path: conflict})
+        logger.info(f"[image_data] {img_path} 更新一筆成功 (version={version})")
+        return version
+
+    def update_notes(self, notes, expected_versions=None):
+        # 批次更新註解 {image_path: note}，單一交易寫入
+        # expected_versions 有記錄的列以 compare-and-swap 寫入，衝突的列略過
+        # 回傳 (新版本號 {image_path: version}, 衝突 {image_path: info})
+        expected_versions = expected_versions or {}
+
+        def write(conn):
+            versions, conflicts = {}, {}
+            for img_path, note in notes.items():
+                img_path = str(img_path)
+                version = self._cas_note(conn, img_path, note, expected_versions.get(img_path))
+                if version is None:
+                    conflicts[img_path] = self._conflict_info(conn, img_path, note)
+                else:
+                    versions[img_path] = version
+            return versions, conflicts
+
+        try:
+            versions, conflicts = self._write(write)
+        except Exception:
+            logger.exception("批次更新 note 失敗")
+            raise DBError()
+
+        logger.info(f"[image_data] 批次更新 {len(versions)} 筆成功，衝突 {len(conflicts)} 筆")
+        return versions, conflicts
+
+    def batch_update_notes(self, img_paths, transform, progress=None, cancel=None):
+        # 批次改寫註解：new_note = transform(old_note)，全部在同一個交易內完成
+        #  - progress(done, total): 每處理一批回報一次
+        #  - cancel(): 回傳 True 時中止並 rollback，已處理的部分不會寫入
+        # 回傳實際變更的列 {image_path: (version, new_note)}
+        img_paths = [str(p) for p in img_paths]
+        total = len(img_paths)
+
+        def write(conn):
+            versions = {}
+            for start in range(0, total, BATCH_CHUNK_SIZE):
+                if cancel and cancel():
+                    raise OperationCancelledError()
+
+                chunk = img_paths[start:start + BATCH_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                sql = f"""
+                SELECT image_path, note
+                FROM image_data
+                WHERE image_path IN ({placeholders})
+                """
+                notes = dict(conn.execute(sql, chunk).fetchall())
+
+                rows = []
+                for img_path in chunk:
+                    old = notes.get(img_path) or ""
+                    new = transform(old)
+                    if new != old:
+                        rows.append((img_path, new))
+                sql = """
+                INSERT INTO image_data (image_path, note)
+                    VALUES (?, ?)
+                ON CONFLICT(image_path) DO UPDATE SET note = excluded.note
+                """
+                conn.executemany(sql, rows)
+
+                if rows:
+                    placeholders = ",".join("?" * len(rows))
+                    sql = f"""
+                    SELECT image_path, version, note
+                    FROM image_data
+                    WHERE image_path IN ({placeholders})
                     """
-                    conn.execute(sql, (img_path, ""))
-                    conn.commit()
-                    logger.info(f"[image_data] {img_path} 新增一筆成功")
+                    for path, version, note in conn.execute(sql, [path for path, _ in rows]):
+                        versions[path] = (version, note)
+
+                if progress:
+                    progress(min(start + BATCH_CHUNK_SIZE, total), total)
+            return versions
+
+        try:
+            versions = self._write(write)
+        except OperationCancelledError:
+            logger.info(f"[image_data] 批次改寫已取消 (共 {total} 筆)")
+            raise
+        except Exception:
+            logger.exception("批次改寫 note 失敗")
+            raise DBError()
+
+        logger.info(f"[image_data] 批次改寫 {total} 筆，實際變更 {len(versions)} 筆")
+        return versions
 
+    def get_annotated_paths(self, path_prefix=""):
+        # 取得路徑前綴下所有已註記的圖片路徑 (走 image_path 唯一索引的範圍查詢)
+        try:
+            prefix = str(path_prefix)
+            with self._connect() as conn:
+                sql = """
+                SELECT image_path
+                FROM image_data
+                WHERE image_path >= ? AND image_path < ?
+                    AND note IS NOT NULL AND note != ''
+                """
+                rows = conn.execute(sql, (prefix, prefix + "\U0010ffff")).fetchall()
+
+            return [path for (path, ) in rows]
+
+        except Exception:
+            logger.exception("取得已註記路徑失敗")
+            raise DBError()
+
+    def get_metadata_stamps(self, source):
+        # 圖源已快取圖片資訊的 {image_path: (file_size, mtime)}，用於找出缺少或過期的圖片
+        try:
+            with self._connect() as conn:
                 sql = """
-                UPDATE image_data
-                SET note = ?
+                SELECT image_path, file_size, mtime
+                FROM image_meta
+                WHERE source = ?
+                """
+                rows = conn.execute(sql, (str(source), )).fetchall()
+
+            return {path: (file_size, mtime) for path, file_size, mtime in rows}
+
+        except Exception:
+            logger.exception("取得圖片資訊快取失敗")
+            raise DBError()
+
+    def upsert_metadata(self, source, rows):
+        # 寫入圖源的圖片資訊 {image_path: {欄位: 值}}，單一交易
+        columns = ", ".join(METADATA_FIELDS)
+        placeholders = ", ".join("?" * (len(METADATA_FIELDS) + 2))
+        updates = ", ".join(f"{col} = excluded.{col}" for col in ("source", ) + METADATA_FIELDS)
+        sql = f"""
+        INSERT INTO image_meta (image_path, source, {columns})
+            VALUES ({placeholders})
+        ON CONFLICT(image_path) DO UPDATE SET {updates}
+        """
+        params = [
+            (str(img_path), str(source), *(meta.get(col) for col in METADATA_FIELDS))
+            for img_path, meta in rows.items()
+        ]
+
+        try:
+            self._write(lambda conn: conn.executemany(sql, params))
+        except Exception:
+            logger.exception("寫入圖片資訊失敗")
+            raise DBError()
+
+        logger.info(f"[image_meta] 寫入 {len(params)} 筆")
+
+    def get_metadata(self, img_path):
+        # 取得單張圖片資訊，未建立時回傳 None
+        try:
+            with self._connect() as conn:
+                sql = f"""
+                SELECT {", ".join(METADATA_FIELDS)}
+                FROM image_meta
                 WHERE image_path = ?
                 """
-                conn.execute(sql, (note, img_path))
-                conn.commit()
-                logger.info(f"[image_data] {img_path} 更新一筆成功")
+                row = conn.execute(sql, (str(img_path), )).fetchone()
+
+            return dict(zip(METADATA_FIELDS, row)) if row else None
 
         except Exception:
-            logger.exception("更新 note 失敗")
+            logger.exception("取得圖片資訊失敗")
+            raise DBError()
+
+    def get_metadata_values(self, column, source):
+        # 圖源中篩選欄位出現過的值 (format / camera)，走欄位索引
+        if column not in METADATA_FILTER_COLUMNS:
+            raise DBError(f"不支援的篩選欄位: {column}")
+        try:
+            with self._connect() as conn:
+                sql = f"""
+                SELECT DISTINCT {column}
+                FROM image_meta
+                WHERE source = ? AND {column} IS NOT NULL
+                ORDER BY {column}
+                """
+                rows = conn.execute(sql, (str(source), )).fetchall()
+
+            return [value for (value, ) in rows]
+
+        except Exception:
+            logger.exception("取得篩選值失敗")
+            raise DBError()
+
+    def query_image_paths(self, source, sort_by=None, descending=False, filters=None):
+        """
+        Use case:
+            - 依圖片資訊排序 / 篩選，回傳 image_path 清單 (只含已建立圖片資訊的圖片)
+            - sort_by: METADATA_SORT_COLUMNS 之一，None 依路徑排序
+            - filters: {"format": ..., "camera": ..., "min_width": ..., "min_height": ...,
+                        "taken_from": ..., "taken_to": ...}
+            - 排序欄位為 NULL 的圖片 (例如沒有 EXIF) 一律排在最後
+        """
+        if sort_by is not None and sort_by not in METADATA_SORT_COLUMNS:
+            raise DBError(f"不支援的排序欄位: {sort_by}")
+
+        where = ["source = ?"]
+        params = [str(source)]
+        for key, value in (filters or {}).items():
+            if value in (None, ""):
+                continue
+            if key in METADATA_FILTER_COLUMNS:
+                where.append(f"{key} = ?")
+            elif key == "min_width":
+                where.append("width >= ?")
+            elif key == "min_height":
+                where.append("height >= ?")
+            elif key == "taken_from":
+                where.append("taken_at >= ?")
+            elif key == "taken_to":
+                where.append("taken_at <= ?")
+            else:
+                raise DBError(f"不支援的篩選條件: {key}")
+            params.append(value)
+
+        order = "DESC" if descending else "ASC"
+        try:
+            with self._connect() as conn:
+                if sort_by is None:
+                    sql = f"""
+                    SELECT image_path FROM image_meta
+                    WHERE {" AND ".join(where)}
+                    ORDER BY image_path {order}
+                    """
+                    rows = conn.execute(sql, params).fetchall()
+                else:
+                    # 分成 非 NULL / NULL 兩段查詢，ORDER BY 都能直接走索引順序，不需額外排序
+                    sql = f"""
+                    SELECT image_path FROM image_meta
+                    WHERE {" AND ".join(where)} AND {sort_by} IS NOT NULL
+                    ORDER BY {sort_by} {order}, image_path {order}
+                    """
+                    rows = conn.execute(sql, params).fetchall()
+                    sql = f"""
+                    SELECT image_path FROM image_meta
+                    WHERE {" AND ".join(where)} AND {sort_by} IS NULL
+                    ORDER BY image_path {order}
+                    """
+                    rows += conn.execute(sql, params).fetchall()
+
+            return [path for (path, ) in rows]
+
+        except Exception:
+            logger.exception("圖片資訊查詢失敗")
+            raise DBError()
+
+    def iter_annotated(self, after_id=0, batch_size=1000):
+        # 依 id 順序串流已註記的列 (id, image_path, note)
+        # 以 keyset 分頁 (id > 上一批最後 id)，不長時間持有讀取交易，也不一次載入全部
+        try:
+            last_id = after_id
+            while True:
+                with self._connect() as conn:
+                    sql = """
+                    SELECT id, image_path, note
+                    FROM image_data
+                    WHERE id > ? AND note IS NOT NULL AND note != ''
+                    ORDER BY id
+                    LIMIT ?
+                    """
+                    rows = conn.execute(sql, (last_id, batch_size)).fetchall()
+
+                yield from rows
+                if len(rows) < batch_size:
+                    return
+                last_id = rows[-1][0]
+
+        except Exception:
+            logger.exception("串流已註記資料失敗")
             raise DBError()
+
+    # ========== 變更序號 (Change Feed) ==========
+    def get_change_seq(self):
+        # 目前最新的全域變更序號
+        try:
+            with self._connect() as conn:
+                (seq, ) = conn.execute("SELECT seq FROM change_counter WHERE id = 1").fetchone()
+            return seq
+
+        except Exception:
+            logger.exception("取得變更序號失敗")
+            raise DBError()
+
+    def get_changes_since(self, seq, limit=1000):
+        # 取得 change_seq > seq 的列 (走 change_seq 索引，不掃描整張表)
+        try:
+            with self._connect() as conn:
+                sql = """
+                SELECT image_path, note, version, change_seq
+                FROM image_data
+                WHERE change_seq > ?
+                ORDER BY change_seq
+                LIMIT ?
+                """
+                rows = conn.execute(sql, (seq, limit)).fetchall()
+
+            return [
+                {"image_path": path, "note": note, "version": version, "change_seq": change_seq}
+                for path, note, version, change_seq in rows
+            ]
+
+        except Exception:
+            logger.exception("取得變更資料失敗")
+            raise DBError()
+
+    # ========== 區域註解 (Region) ==========
+    @staticmethod
+    def _region_bounds(kind, points):
+        # 區域外框 (min_x, max_x, min_y, max_y)
+        if kind not in ("bbox", "polygon"):
+            raise ValueError(f"未知的區域類型: {kind}")
+        if (kind == "bbox" and len(points) != 2) or (kind == "polygon" and len(points) < 3):
+            raise ValueError(f"區域頂點數量不符: {kind}/{len(points)}")
+        xs = [float(x) for x, _ in points]
+        ys = [float(y) for _, y in points]
+        return min(xs), max(xs), min(ys), max(ys)
+
+    @staticmethod
+    def _contains(kind, points, x, y):
+        # 精確命中判斷：bbox 已由 rtree 判斷，polygon 以射線法判斷
+        if kind == "bbox":
+            return True
+        inside = False
+        n = len(points)
+        for i in range(n):
+            x1, y1 = points[i]
+            x2, y2 = points[(i + 1) % n]
+            if (y1 > y) != (y2 > y):
+                cross_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+                if x < cross_x:
+                    inside = not inside
+        return inside
+
+    @staticmethod
+    def _region_row(row):
+        region_id, kind, points, label, min_x, max_x, min_y, max_y = row
+        return {
+            "id": region_id,
+            "kind": kind,
+            "points": json.loads(points),
+            "label": label or "",
+            "bounds": (min_x, min_y, max_x, max_y),
+        }
+
+    def add_region(self, img_path, kind, points, label=""):
+        # 新增一筆區域註解，回傳 region id
+        img_path = str(img_path)
+
+        def write(conn):
+            sql = """
+            INSERT OR IGNORE INTO image_data (image_path, note)
+                VALUES (?, ?)
+            """
+            conn.execute(sql, (img_path, ""))
+            sql = """
+            SELECT id
+            FROM image_data
+            WHERE image_path = ?
+            """
+            (image_id, ) = conn.execute(sql, (img_path, )).fetchone()
+
+            sql = """
+            INSERT INTO image_region (image_id, kind, points, label)
+                VALUES (?, ?, ?, ?)
+            """
+            cur = conn.execute(sql, (image_id, kind, json.dumps(points), label))
+            region_id = cur.lastrowid
+
+            sql = """
+            INSERT INTO image_region_rtree
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """
+            conn.execute(sql, (region_id, image_id, image_id, min_x, max_x, min_y, max_y))
+            return region_id
+
+        try:
+            min_x, max_x, min_y, max_y = self._region_bounds(kind, points)
+            region_id = self._write(write)
+
+            logger.info(f"[image_region] {img_path} 新增區域 {region_id}")
+            return region_id
+
+        except Exception:
+            logger.exception("新增區域失敗")
+            raise DBError()
+
+    def delete_region(self, region_id):
+        # 刪除一筆區域註解
+        def write(conn):
+            conn.execute("DELETE FROM image_region_rtree WHERE id = ?", (region_id, ))
+            conn.execute("DELETE FROM image_region WHERE id = ?", (region_id, ))
+
+        try:
+            self._write(write)
+
+            logger.info(f"[image_region] 刪除區域 {region_id}")
+
+        except Exception:
+            logger.exception("刪除區域失敗")
+            raise DBError()
+
+    def get_regions_in_rect(self, img_path, x0, y0, x1, y1):
+        # 依 rtree 取得與矩形 (圖片座標) 相交的區域
+        try:
+            img_path = str(img_path)
+
+            with self._connect() as conn:
+                sql = """
+                SELECT r.id, r.kind, r.points, r.label, t.min_x, t.max_x, t.min_y, t.max_y
+                FROM image_data AS d
+                JOIN image_region_rtree AS t
+                    ON t.min_img <= d.id AND t.max_img >= d.id
+                JOIN image_region AS r
+                    ON r.id = t.id AND r.image_id = d.id
+                WHERE d.image_path = ?
+                    AND t.max_x >= ? AND t.min_x <= ?
+                    AND t.max_y >= ? AND t.min_y <= ?
+                """
+                rows = conn.execute(sql, (img_path, x0, x1, y0, y1)).fetchall()
+
+            return [self._region_row(row) for row in rows]
+
+        except Exception:
+            logger.exception("區域查詢失敗")
+            raise DBError()
+
+    def hit_test_region(self, img_path, x, y):
+        # 取得包含 (x, y) 的區域，多筆重疊時以面積最小者優先
+        regions = [
+            region for region in self.get_regions_in_rect(img_path, x, y, x, y)
+            if self._contains(region["kind"], region["points"], x, y)
+        ]
+        regions.sort(key=lambda r: (r["bounds"][2] - r["bounds"][0]) * (r["bounds"][3] - r["bounds"][1]))
+        return regions
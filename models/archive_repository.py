@@ -0,0 +1,265 @@
+""" 壓縮檔圖片儲存庫 【.zip / .tar】
+ - 首次開啟建立成員索引，索引快取於資料庫旁，之後開啟不需再掃描壓縮檔
+ - 以 mmap 隨機存取單張圖片，不解壓縮整個壓縮檔
+ - 圖片路徑 = 壓縮檔路徑 / 成員名稱，可穩定作為 AnnotationDB 的 key
+"""
+
+import io
+import os
+import json
+import mmap
+import time
+import zlib
+import struct
+import hashlib
+import logging
+import tarfile
+import zipfile
+import threading
+from pathlib import Path
+from PIL import Image
+from config.errors import PathError, ImageError
+from models.image_index import ImageIndex
+from models.image_metadata import read_image_header
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = (".jpg", ".png", ".jpeg")
+INDEX_VERSION = 1
+
+# zip local file header: signature(4) ... 檔名長度(26:28)、extra 長度(28:30)
+_ZIP_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_ZIP_LOCAL_SIGNATURE = b"PK\x03\x04"
+
+
+class ArchiveImageRepository:
+    def __init__(self, archive_path, cache_dir=None):
+        # 初始化
+        try:
+            archive_path = Path(archive_path).resolve()
+        except Exception:
+            logger.exception(f"轉換 Path 失敗: {archive_path}")
+            raise PathError()
+        if not archive_path.is_file():
+            logger.exception(f"路徑非檔案格式: {archive_path}")
+            raise PathError(f"{archive_path} 非檔案格式。")
+
+        if zipfile.is_zipfile(archive_path):
+            self.kind = "zip"
+        elif archive_path.suffix.lower() == ".tar" and tarfile.is_tarfile(archive_path):
+            # .tar.gz / .tar.bz2 等串流壓縮無法隨機存取，只支援未壓縮的 tar
+            self.kind = "tar"
+        else:
+            logger.exception(f"不支援的壓縮檔格式: {archive_path}")
+            raise PathError(f"{archive_path} 非支援的壓縮檔。(目前僅支援 .zip 與未壓縮的 .tar)")
+
+        self.archive = archive_path
+        # 與 ImageRepository 相同的屬性名稱，供 View 顯示來源名稱
+        self.folder = archive_path
+        self.cache_dir = Path(cache_dir) if cache_dir else archive_path.parent
+
+        self._file = None
+        self._mmap = None
+        # zipfile 物件非 thread-safe，僅在非 stored / deflated 成員時使用
+        self._zip = None
+        self._zip_lock = threading.Lock()
+        # 背景算圖與主執行緒可能同時第一次讀取
+        self._mmap_lock = threading.Lock()
+
+        self._members = self._load_index()
+        # 路徑字串與 str(壓縮檔路徑 / 成員名稱) 相同 (DB key 不變)，共用前綴只存一次
+        prefix = str(self.archive) + os.sep
+        self.images = ImageIndex(prefix, (str(self.archive / m["name"])[len(prefix):] for m in self._members))
+
+        logger.info(f"ArchiveImageRepository initialized，圖片數量={len(self.images)}")
+
+    # ========== 索引 ==========
+    def _index_path(self):
+        # 快取檔名帶壓縮檔完整路徑的雜湊，避免不同資料夾的同名壓縮檔互相覆蓋
+        digest = hashlib.sha1(str(self.archive).encode("utf-8")).hexdigest()[:10]
+        return self.cache_dir / f"{self.archive.name}.{digest}.index.json"
+
+    def _load_index(self):
+        # 讀取快取索引；壓縮檔大小或修改時間不同時重新建立
+        stat = self.archive.stat()
+        index_path = self._index_path()
+        try:
+            if index_path.is_file():
+                with open(index_path, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if (cached.get("version") == INDEX_VERSION
+                        and cached.get("size") == stat.st_size
+                        and cached.get("mtime") == stat.st_mtime):
+                    logger.info(f"使用快取索引: {index_path}")
+                    return cached["members"]
+                logger.info(f"快取索引已過期，重新建立: {index_path}")
+        except Exception:
+            logger.warning(f"快取索引讀取失敗，重新建立: {index_path}", exc_info=True)
+
+        members = self._build_index()
+        try:
+            tmp_path = index_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": INDEX_VERSION,
+                    "archive": str(self.archive),
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "members": members,
+                }, f, ensure_ascii=False, separators=(",", ":"))
+            tmp_path.replace(index_path)
+            logger.info(f"索引已建立: {index_path}")
+        except Exception:
+            # 快取寫入失敗不影響瀏覽，只是下次需要重新掃描
+            logger.warning(f"索引快取寫入失敗: {index_path}", exc_info=True)
+
+        return members
+
+    def _build_index(self):
+        # 掃描壓縮檔成員 (只讀目錄/標頭，不讀圖片內容)
+        try:
+            members = []
+            if self.kind == "zip":
+                with zipfile.ZipFile(self.archive) as zf:
+                    for info in zf.infolist():
+                        if info.is_dir() or Path(info.filename).suffix.lower() not in IMAGE_SUFFIXES:
+                            continue
+                        members.append({
+                            "name": info.filename,
+                            "header_offset": info.header_offset,
+                            "compress_type": info.compress_type,
+                            "compress_size": info.compress_size,
+                            "size": info.file_size,
+                            "date_time": list(info.date_time),
+                        })
+            else:
+                with tarfile.open(self.archive, "r:") as tf:
+                    for info in tf:
+                        if not info.isfile() or Path(info.name).suffix.lower() not in IMAGE_SUFFIXES:
+                            continue
+                        members.append({
+                            "name": info.name,
+                            "offset": info.offset_data,
+                            "size": info.size,
+                            "mtime": info.mtime,
+                        })
+
+            members.sort(key=lambda m: m["name"])
+            return members
+
+        except Exception:
+            logger.error("建立壓縮檔索引失敗", exc_info=True)
+            raise ImageError()
+
+    # ========== 讀取 ==========
+    def _get_mmap(self):
+        # 延遲建立 mmap，整個 repository 共用一份
+        with self._mmap_lock:
+            if self._mmap is None:
+                self._file = open(self.archive, "rb")
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mmap
+
+    def _read_zip_member(self, member):
+        mm = self._get_mmap()
+        start = member["header_offset"]
+        header = _ZIP_LOCAL_HEADER.unpack(mm[start:start + _ZIP_LOCAL_HEADER.size])
+        if header[0] != _ZIP_LOCAL_SIGNATURE:
+            raise ImageError(f"zip local header 損毀: {member['name']}")
+        # header[-2] = 檔名長度，header[-1] = extra 長度
+        data_start = start + _ZIP_LOCAL_HEADER.size + header[-2] + header[-1]
+        raw = mm[data_start:data_start + member["compress_size"]]
+
+        if member["compress_type"] == zipfile.ZIP_STORED:
+            return raw
+        if member["compress_type"] == zipfile.ZIP_DEFLATED:
+            return zlib.decompress(raw, -zlib.MAX_WBITS)
+
+        # 其他壓縮方式 (bzip2/lzma...) 交給 zipfile 處理
+        with self._zip_lock:
+            if self._zip is None:
+                self._zip = zipfile.ZipFile(self.archive)
+            return self._zip.read(member["name"])
+
+    def _read_tar_member(self, member):
+        mm = self._get_mmap()
+        return mm[member["offset"]:member["offset"] + member["size"]]
+
+    def _member(self, img_path):
+        index = self.images.index_of(img_path)
+        if index is None:
+            logger.error(f"壓縮檔內找不到圖片: {img_path}")
+            raise ImageError()
+        return self._members[index]
+
+    def index_of(self, img_path):
+        # 由圖片路徑反查索引，不在此圖源中回傳 None
+        return self.images.index_of(img_path)
+
+    def read_bytes(self, img_path):
+        # 取得單張圖片的原始位元組
+        member = self._member(img_path)
+        try:
+            if self.kind == "zip":
+                return self._read_zip_member(member)
+            return self._read_tar_member(member)
+        except ImageError:
+            raise
+        except Exception:
+            logger.exception(f"壓縮檔圖片讀取失敗: {img_path}")
+            raise ImageError()
+
+    def stat(self, img_path):
+        # 成員大小與修改時間 (file_size, mtime)，直接取自成員索引
+        member = self._member(img_path)
+        if self.kind == "zip":
+            return member["size"], time.mktime(tuple(member["date_time"]) + (0, 0, -1))
+        return member["size"], float(member["mtime"])
+
+    def read_metadata(self, img_path):
+        # 只解析檔頭取得圖片資訊 (尺寸、格式、EXIF)，不解碼像素
+        file_size, mtime = self.stat(img_path)
+        data = self.read_bytes(img_path)
+        try:
+            meta = read_image_header(io.BytesIO(data))
+        except Exception:
+            logger.exception(f"圖片資訊讀取失敗: {img_path}")
+            raise ImageError()
+
+        meta.update(file_size=file_size, mtime=mtime)
+        return meta
+
+    def open(self, img_path):
+        # 開啟單張圖片 (PIL Image)
+        data = self.read_bytes(img_path)
+        try:
+            return Image.open(io.BytesIO(data))
+        except Exception:
+            logger.exception(f"圖片解析失敗: {img_path}")
+            raise ImageError()
+
+    def close(self):
+        # 釋放 mmap 與檔案
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+    def __len__(self):
+        return len(self.images)
+
+    def get(self, index):
+        # 取得單張圖片
+        try:
+            path = self.images[index]
+            logger.debug(f"取得圖片索引偏移量={index}, 圖片位置={path}")
+            return path
+
+        except Exception:
+            logger.exception("AssertionError：圖片 index 假設不成立")
+            raise ImageError()
@@ -0,0 +1,225 @@
+""" 註解資料庫線上備份 / 還原
+ - 以 SQLite online backup API 複製，每次只複製少量 page，步驟之間釋放鎖，標註中的寫入不會被卡住
+ - 備份期間來源被其他連線寫入時 SQLite 會從頭重來；重來太多次改為一次複製 (WAL 模式下不阻塞寫入)
+ - 完成後 integrity_check 驗證，可選 gzip 壓縮，保留最近 N 份
+ - 還原先驗證備份檔，再以 backup API 寫回目標資料庫 (經 SQLite 鎖定，其他連線不會讀到寫一半的檔案)
+"""
+
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+from pathlib import Path
+from datetime import datetime
+from config.errors import PathError, BackupError, OperationCancelledError
+
+logger = logging.getLogger(__name__)
+
+# 每一步複製的 page 數 (預設 page 4KB => 每步約 4MB)
+BACKUP_PAGES = 1024
+# 每一步之間的暫停秒數，讓其他連線取得寫入鎖
+BACKUP_STEP_PAUSE = 0.01
+# 來源忙碌 (locked / busy) 時，SQLite 重試前等待的秒數
+BACKUP_BUSY_SLEEP = 0.25
+# 備份因來源變更重來的次數上限，超過後改為一次複製
+MAX_RESTARTS = 3
+# 保留的備份份數
+BACKUP_KEEP = 10
+TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class DatabaseBackup:
+    def __init__(self, db_path, backup_dir=None, keep=BACKUP_KEEP, busy_timeout=30.0):
+        # 初始化
+        try:
+            db_path = Path(db_path)
+            backup_dir = Path(backup_dir) if backup_dir else db_path.parent / "backups"
+        except Exception:
+            logger.exception(f"轉換 Path 失敗: {db_path}")
+            raise PathError()
+        if not db_path.is_file():
+            logger.exception(f"路徑非檔案格式: {db_path}")
+            raise PathError(f"{db_path} 非檔案格式。")
+
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.busy_timeout = busy_timeout
+
+    # ========== 備份 ==========
+    def _backup_name(self, compress):
+        stamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+        return f"{self.db_path.stem}.{stamp}.db" + (".gz" if compress else "")
+
+    def _copy(self, src, dst, pages, progress, cancel):
+        # 逐步複製；回傳 (是否完成, page 總數, 重來次數)。來源變更導致重來過多次時回傳未完成
+        state = {"total": 0, "restarts": 0, "last_remaining": None}
+
+        def on_step(status, remaining, total):
+            if cancel and cancel():
+                raise OperationCancelledError()
+            # remaining 變多 = SQLite 因來源被寫入而從頭複製
+            if state["last_remaining"] is not None and remaining > state["last_remaining"]:
+                state["restarts"] += 1
+                logger.info(f"備份期間資料庫有變更，重新複製 ({state['restarts']}/{MAX_RESTARTS})")
+                if pages > 0 and state["restarts"] > MAX_RESTARTS:
+                    raise _TooManyRestarts()
+            state["last_remaining"] = remaining
+            state["total"] = total
+            if progress:
+                progress(total - remaining, total)
+            if remaining and pages > 0:
+                time.sleep(BACKUP_STEP_PAUSE)
+
+        try:
+            src.backup(dst, pages=pages, progress=on_step, sleep=BACKUP_BUSY_SLEEP)
+        except _TooManyRestarts:
+            return False, state["total"], state["restarts"]
+        return True, state["total"], state["restarts"]
+
+    @staticmethod
+    def _verify(conn):
+        (result, ) = conn.execute("PRAGMA integrity_check").fetchone()
+        if result != "ok":
+            raise BackupError(f"備份檔驗證失敗: {result}")
+
+    def backup(self, compress=False, pages=BACKUP_PAGES, progress=None, cancel=None):
+        """
+        Use case:
+            - 線上備份資料庫 (不需停止標註)，回傳報告 {path, pages, bytes, elapsed_sec, restarts}
+            - compress=True 輸出 .db.gz
+            - progress(done_pages, total_pages) 每一步回報一次
+            - cancel() 回傳 True 時停止並刪除未完成的備份檔
+        """
+        start = time.perf_counter()
+        try:
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
+        except Exception:
+            logger.exception(f"備份資料夾建立失敗: {self.backup_dir}")
+            raise PathError()
+
+        final_path = self.backup_dir / self._backup_name(compress)
+        tmp_path = final_path.with_name(final_path.name + ".tmp")
+        # 壓縮時先備份成未壓縮的暫存檔 (backup API 需要可隨機寫入的資料庫檔)
+        db_tmp_path = final_path.with_name(final_path.name[:-len(".gz")] + ".tmp") if compress else tmp_path
+        try:
+            src = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+            dst = sqlite3.connect(db_tmp_path)
+            try:
+                done, total, restarts = self._copy(src, dst, pages, progress, cancel)
+                if not done:
+                    # 來源寫入頻繁：改為一次複製 (只持有讀取鎖；WAL 模式下不影響寫入)
+                    logger.warning("備份重來次數過多，改為一次複製")
+                    _, total, _ = self._copy(src, dst, -1, progress, cancel)
+                self._verify(dst)
+            finally:
+                dst.close()
+                src.close()
+
+            if compress:
+                with open(db_tmp_path, "rb") as f_in, gzip.open(tmp_path, "wb", compresslevel=6) as f_out:
+                    shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+                db_tmp_path.unlink()
+            os.replace(tmp_path, final_path)
+
+        except (OperationCancelledError, BackupError):
+            self._discard(tmp_path, db_tmp_path)
+            logger.info(f"備份未完成: {self.db_path}")
+            raise
+        except Exception:
+            self._discard(tmp_path, db_tmp_path)
+            logger.exception(f"資料庫備份失敗: {self.db_path}")
+            raise BackupError()
+
+        self._prune()
+        report = {
+            "path": str(final_path),
+            "pages": total,
+            "bytes": final_path.stat().st_size,
+            "elapsed_sec": round(time.perf_counter() - start, 2),
+            "restarts": restarts,
+        }
+        logger.info(f"資料庫備份完成: {report}")
+        return report
+
+    @staticmethod
+    def _discard(*paths):
+        for path in paths:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                logger.warning(f"暫存檔刪除失敗: {path}", exc_info=True)
+
+    def list_backups(self):
+        # 依時間由新到舊列出備份檔
+        if not self.backup_dir.is_dir():
+            return []
+        backups = [
+            p for p in self.backup_dir.glob(f"{self.db_path.stem}.*.db*")
+            if p.name.endswith((".db", ".db.gz"))
+        ]
+        return sorted(backups, key=lambda p: p.name, reverse=True)
+
+    def _prune(self):
+        # 只保留最近 keep 份
+        if not self.keep:
+            return
+        for path in self.list_backups()[self.keep:]:
+            try:
+                path.unlink()
+                logger.info(f"刪除舊備份: {path}")
+            except OSError:
+                logger.warning(f"舊備份刪除失敗: {path}", exc_info=True)
+
+    # ========== 還原 ==========
+    def restore(self, backup_path, progress=None):
+        """
+        Use case:
+            - 以備份檔覆蓋資料庫 (.db 或 .db.gz)
+            - 先驗證備份檔；寫回後再驗證一次目標資料庫
+            - 經 SQLite 鎖定寫入，其他連線正在寫入時會等待 (busy timeout)
+        """
+        backup_path = Path(backup_path)
+        if not backup_path.is_file():
+            logger.error(f"備份檔不存在: {backup_path}")
+            raise PathError(f"{backup_path} 非檔案格式。")
+
+        tmp_path = None
+        try:
+            source_path = backup_path
+            if backup_path.suffix == ".gz":
+                tmp_path = self.db_path.with_name(self.db_path.name + ".restore.tmp")
+                with gzip.open(backup_path, "rb") as f_in, open(tmp_path, "wb") as f_out:
+                    shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+                source_path = tmp_path
+
+            src = sqlite3.connect(source_path)
+            dst = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+            try:
+                self._verify(src)
+                # 還原必須一次完成，避免其他連線看到新舊混合的內容
+                src.backup(dst, pages=-1, progress=(lambda s, r, t: progress(t - r, t)) if progress else None)
+                self._verify(dst)
+            finally:
+                dst.close()
+                src.close()
+
+        except BackupError:
+            logger.exception(f"備份檔驗證失敗，未還原: {backup_path}")
+            raise
+        except Exception:
+            logger.exception(f"資料庫還原失敗: {backup_path}")
+            raise BackupError()
+        finally:
+            if tmp_path is not None:
+                self._discard(tmp_path)
+
+        logger.info(f"資料庫已由備份還原: {backup_path} => {self.db_path}")
+        return {"path": str(backup_path), "db_path": str(self.db_path)}
+
+
+class _TooManyRestarts(Exception):
+    # 內部使用：中止逐步備份，改為一次複製
+    pass
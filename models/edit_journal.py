@@ -0,0 +1,92 @@
+""" 註解編輯日誌 (append-only journal)
+ - 自動儲存的快照先循序寫入本機日誌檔 (JSON Lines)，成本遠低於 DB 交易
+ - 日誌分批併入 AnnotationDB 後清空
+ - 程式異常結束時，下次啟動重播日誌即可找回尚未入庫的註解
+"""
+
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from config.errors import PathError, DBError
+
+logger = logging.getLogger(__name__)
+
+
+class EditJournal:
+    def __init__(self, journal_path, fsync=True):
+        # 初始化
+        try:
+            journal_path = Path(journal_path)
+        except Exception:
+            logger.exception(f"轉換 Path 失敗: {journal_path}")
+            raise PathError()
+        if not journal_path.parent.is_dir():
+            logger.exception(f"日誌所在資料夾不存在: {journal_path}")
+            raise PathError(f"{journal_path.parent} 非資料夾路徑。")
+
+        self.journal_path = journal_path
+        # fsync=True 時連作業系統當機也不會遺失已寫入的快照
+        self.fsync = fsync
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+        return self._file
+
+    def append(self, img_path, note, version=None):
+        # 追加一筆快照；version 為編輯開始時讀到的版本號，重播時用於衝突檢查
+        try:
+            line = json.dumps(
+                {"t": time.time(), "p": str(img_path), "n": note, "v": version},
+                ensure_ascii=False
+            )
+            f = self._open()
+            f.write(line + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+        except Exception:
+            logger.exception(f"日誌寫入失敗: {img_path}")
+            raise DBError()
+
+    def read(self):
+        # 依寫入順序讀出所有快照 (image_path, note, version)；結尾寫到一半的行 (當機) 直接略過
+        if not self.journal_path.is_file():
+            return []
+
+        entries = []
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    try:
+                        entry = json.loads(line)
+                        entries.append((entry["p"], entry["n"], entry.get("v")))
+                    except (ValueError, KeyError):
+                        logger.warning(f"略過損毀的日誌行: {self.journal_path}:{line_no}")
+            return entries
+
+        except Exception:
+            logger.exception(f"日誌讀取失敗: {self.journal_path}")
+            raise DBError()
+
+    def clear(self):
+        # 已併入 DB 後清空日誌
+        try:
+            self.close()
+            with open(self.journal_path, "w", encoding="utf-8") as f:
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+        except Exception:
+            logger.exception(f"日誌清空失敗: {self.journal_path}")
+            raise DBError()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,95 @@
+""" 精簡圖片路徑索引
+ - 共用前綴 (資料夾 / 壓縮檔路徑) 只存一次
+ - 檔名以 UTF-8 串接成單一 bytes，另以 array 記錄每個檔名的起訖位置
+ - 檔名 => 索引 以 open addressing 雜湊表 (array) 反查，不建立 dict
+ - 對外行為與 list[str] 相同 (索引、切片、迭代、len、in)，取值時才組出路徑字串
+"""
+
+import logging
+from array import array
+from itertools import accumulate
+from collections.abc import Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class ImageIndex(Sequence):
+    def __init__(self, prefix, names):
+        # 初始化：names 需已依顯示順序排序
+        self.prefix = prefix
+        names = list(names)
+        encoded = [name.encode("utf-8") for name in names]
+        self._blob = b"".join(encoded)
+        self._offsets = array("q", [0])
+        self._offsets.extend(accumulate(len(e) for e in encoded))
+        self._size = len(names)
+        # 建表時直接用傳入的字串計算雜湊，建完即釋放
+        self._table, self._mask = self._build_table(names)
+
+        logger.debug(f"ImageIndex built，圖片數量={self._size}，檔名區塊={len(self._blob)} bytes")
+
+    def _build_table(self, names):
+        # 雜湊表大小取 >= 2n 的 2 的次方，負載率 <= 0.5，線性探測很短
+        capacity = 8
+        while capacity < self._size * 2:
+            capacity *= 2
+        mask = capacity - 1
+        # 存 索引 + 1，0 代表空位
+        table = array("q", [0]) * capacity
+        for i, name in enumerate(names):
+            slot = hash(name) & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = i + 1
+        return table, mask
+
+    def _name(self, index):
+        return self._blob[self._offsets[index]:self._offsets[index + 1]].decode("utf-8")
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.prefix + self._name(i) for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ImageIndex index out of range")
+        return self.prefix + self._name(index)
+
+    def __iter__(self):
+        blob, offsets, prefix = self._blob, self._offsets, self.prefix
+        for i in range(self._size):
+            yield prefix + blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+
+    def __contains__(self, img_path):
+        return self.index_of(img_path) is not None
+
+    def index(self, img_path, start=0, stop=None):
+        # 覆寫 Sequence.index 的線性搜尋
+        index = self.index_of(img_path)
+        if index is None or index < start or (stop is not None and index >= stop):
+            raise ValueError(f"{img_path} is not in ImageIndex")
+        return index
+
+    def index_of(self, img_path):
+        # 由圖片路徑反查索引，不存在回傳 None
+        img_path = str(img_path)
+        if not img_path.startswith(self.prefix):
+            return None
+        name = img_path[len(self.prefix):]
+        slot = hash(name) & self._mask
+        while True:
+            entry = self._table[slot]
+            if not entry:
+                return None
+            if self._name(entry - 1) == name:
+                return entry - 1
+            slot = (slot + 1) & self._mask
+
+    def memory_size(self):
+        # 索引本身佔用的位元組數 (不含 Python 物件標頭)
+        return (len(self._blob)
+                + self._offsets.itemsize * len(self._offsets)
+                + self._table.itemsize * len(self._table))
@@ -0,0 +1,64 @@
+""" 圖片資訊 (只讀檔頭，不解碼像素)
+ - PIL Image.open 只解析檔頭，取得尺寸與格式
+ - EXIF 取拍攝時間、方向、相機型號
+"""
+
+import logging
+from datetime import datetime
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# EXIF tag
+_EXIF_IFD = 0x8769
+_TAG_ORIENTATION = 0x0112
+_TAG_MAKE = 0x010F
+_TAG_MODEL = 0x0110
+_TAG_DATETIME = 0x0132
+_TAG_DATETIME_ORIGINAL = 0x9003
+
+# image_meta 的欄位 (順序同資料表)
+METADATA_FIELDS = (
+    "width", "height", "format", "file_size", "mtime", "taken_at", "orientation", "camera",
+)
+
+
+def _exif_datetime(value):
+    # EXIF "YYYY:MM:DD HH:MM:SS" => ISO 8601 (字串排序 = 時間排序)
+    try:
+        return datetime.strptime(str(value).strip("\x00 "), "%Y:%m:%d %H:%M:%S").isoformat()
+    except ValueError:
+        return None
+
+
+def read_image_header(fp):
+    """
+    Use case:
+        - fp: 檔案路徑或 file-like
+        - 回傳 {width, height, format, taken_at, orientation, camera}，像素不會被解碼
+    """
+    with Image.open(fp) as img:
+        meta = {
+            "width": img.width,
+            "height": img.height,
+            "format": img.format,
+            "taken_at": None,
+            "orientation": None,
+            "camera": None,
+        }
+        try:
+            exif = img.getexif()
+        except Exception:
+            logger.debug(f"EXIF 解析失敗: {fp}", exc_info=True)
+            return meta
+
+        if not exif:
+            return meta
+        meta["orientation"] = exif.get(_TAG_ORIENTATION)
+        taken = exif.get_ifd(_EXIF_IFD).get(_TAG_DATETIME_ORIGINAL) or exif.get(_TAG_DATETIME)
+        meta["taken_at"] = _exif_datetime(taken) if taken else None
+        camera = " ".join(
+            str(exif[tag]).strip("\x00 ") for tag in (_TAG_MAKE, _TAG_MODEL) if exif.get(tag)
+        )
+        meta["camera"] = camera or None
+        return meta
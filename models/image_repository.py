@@ -4,9 +4,13 @@
  - get images
 """
 
+import os
 import logging
 from pathlib import Path
+from PIL import Image
 from config.errors import PathError, ImageError
+from models.image_index import ImageIndex
+from models.image_metadata import read_image_header
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +28,7 @@ class ImageRepository:
             raise PathError(f"{folder_path} 非資料夾路徑。")
 
         self.folder = folder_path
+        # 圖片路徑 (str) 的精簡索引，同時負責 路徑 => 索引 反查
         self.images = self._load_images()
 
         logger.info(f"ImageRepository initialized，圖片數量={len(self.images)}")
@@ -31,13 +36,13 @@ class ImageRepository:
     def _load_images(self):
         # 載入資料夾中的所有圖片
         try:
-            # .iterdir() => 列出資料夾內容
-            # .suffix => 副檔名    .name => 檔名(含副檔名)   .stem => 純檔名
-            images = sorted([
-                p for p in self.folder.iterdir()
-                if p.suffix.lower() in (".jpg", ".png", ".jpeg")
-            ])
-            return images
+            # os.scandir 只取檔名字串，不為每個檔案建立 Path 物件
+            with os.scandir(self.folder) as entries:
+                names = sorted(
+                    entry.name for entry in entries
+                    if os.path.splitext(entry.name)[1].lower() in (".jpg", ".png", ".jpeg")
+                )
+            return ImageIndex(str(self.folder) + os.sep, names)
 
         except Exception:
             logger.error("載入圖片失敗", exc_info=True)
@@ -57,3 +62,52 @@ class ImageRepository:
         except Exception:
             logger.exception("AssertionError：圖片 index 假設不成立")
             raise ImageError()
+
+    def index_of(self, img_path):
+        # 由圖片路徑反查索引，不在此圖源中回傳 None
+        return self.images.index_of(img_path)
+
+    def read_bytes(self, img_path):
+        # 取得單張圖片的原始位元組
+        try:
+            return Path(img_path).read_bytes()
+
+        except Exception:
+            logger.exception(f"圖片讀取失敗: {img_path}")
+            raise ImageError()
+
+    def stat(self, img_path):
+        # 檔案大小與修改時間 (file_size, mtime)，用於判斷快取的圖片資訊是否過期
+        try:
+            st = os.stat(img_path)
+            return st.st_size, st.st_mtime
+
+        except Exception:
+            logger.exception(f"圖片狀態讀取失敗: {img_path}")
+            raise ImageError()
+
+    def read_metadata(self, img_path):
+        # 只讀檔頭取得圖片資訊 (尺寸、格式、EXIF)，不解碼像素
+        file_size, mtime = self.stat(img_path)
+        try:
+            meta = read_image_header(img_path)
+
+        except Exception:
+            logger.exception(f"圖片資訊讀取失敗: {img_path}")
+            raise ImageError()
+
+        meta.update(file_size=file_size, mtime=mtime)
+        return meta
+
+    def open(self, img_path):
+        # 開啟單張圖片 (PIL Image)
+        try:
+            return Image.open(img_path)
+
+        except Exception:
+            logger.exception(f"圖片開啟失敗: {img_path}")
+            raise ImageError()
+
+    def close(self):
+        # 資料夾來源沒有需要釋放的資源，保留與 ArchiveImageRepository 相同介面
+        pass
@@ -0,0 +1,97 @@
+""" 註記狀態索引
+ - 每張圖片 1 byte 的狀態 (已註記 / 未註記)，依 ImageRepository 的圖片順序
+ - Fenwick tree (Binary Indexed Tree) 維護已註記數量的前綴和
+ - 更新 O(log n)；「下一張 / 上一張 (未)註記」查詢 O(log n)，不需逐張檢查
+"""
+
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+
+class AnnotationStatusIndex:
+    def __init__(self, size, annotated_indices=()):
+        # 初始化：O(n) 建立 Fenwick tree
+        self.size = size
+        self.flags = bytearray(size)
+        for i in annotated_indices:
+            self.flags[i] = 1
+
+        tree = array("l", [0]) * (size + 1)
+        for i in range(1, size + 1):
+            tree[i] += self.flags[i - 1]
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._annotated = sum(self.flags)
+
+        # binary lifting 的最大步長
+        self._top = 1
+        while self._top * 2 <= size:
+            self._top *= 2
+
+        logger.debug(f"AnnotationStatusIndex built，圖片數量={size}，已註記={self._annotated}")
+
+    def __len__(self):
+        return self.size
+
+    def annotated_count(self):
+        return self._annotated
+
+    def is_annotated(self, index):
+        return bool(self.flags[index])
+
+    def set(self, index, annotated):
+        # 更新單張圖片狀態
+        value = 1 if annotated else 0
+        delta = value - self.flags[index]
+        if not delta:
+            return
+        self.flags[index] = value
+        self._annotated += delta
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, length):
+        # [0, length) 中已註記的數量
+        total = 0
+        i = length
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _count(self, length, annotated):
+        # [0, length) 中狀態為 annotated 的數量
+        length = min(max(length, 0), self.size)
+        count = self._prefix(length)
+        return count if annotated else length - count
+
+    def _kth(self, k, annotated):
+        # 第 k 個 (1-based) 狀態為 annotated 的索引，不存在回傳 None
+        total = self._annotated if annotated else self.size - self._annotated
+        if k < 1 or k > total:
+            return None
+        pos = 0
+        step = self._top
+        while step:
+            nxt = pos + step
+            if nxt <= self.size:
+                node = self._tree[nxt] if annotated else step - self._tree[nxt]
+                if node < k:
+                    pos = nxt
+                    k -= node
+            step >>= 1
+        return pos
+
+    def find_next(self, index, annotated=False):
+        # index 之後 (不含) 第一張狀態為 annotated 的圖片
+        return self._kth(self._count(index + 1, annotated) + 1, annotated)
+
+    def find_prev(self, index, annotated=False):
+        # index 之前 (不含) 最後一張狀態為 annotated 的圖片
+        return self._kth(self._count(index, annotated), annotated)
@@ -0,0 +1,151 @@
+""" 批次註解視窗
+ - 對清單中選取的多張圖片套用註解：覆寫 / 附加 / 取代 / 清空
+ - 批次作業在背景執行緒執行，主執行緒以 after() 輪詢進度
+ - 可隨時取消，取消時整批 rollback
+"""
+
+import logging
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+from config.errors import AppError, OperationCancelledError
+
+logger = logging.getLogger(__name__)
+
+POLL_MS = 100
+
+
+class BatchAnnotationDialog(tk.Toplevel):
+    MODES = (
+        ("apply", "覆寫註解"),
+        ("append", "附加於註解後"),
+        ("replace", "搜尋並取代"),
+        ("clear", "清空註解"),
+    )
+
+    def __init__(self, parent, controller, img_paths, on_done=None):
+        super().__init__(parent)
+        self.transient(parent)
+        self.title(f"批次註解（{len(img_paths)} 張）")
+        self.resizable(False, False)
+
+        self.controller = controller
+        self.img_paths = img_paths
+        self.on_done = on_done
+
+        # 背景作業狀態 (僅背景執行緒寫入，主執行緒讀取)
+        self._worker = None
+        self._cancel_event = threading.Event()
+        self._progress = (0, len(img_paths))
+        self._result = None
+        self._error = None
+
+        self._build_layout()
+        self.protocol("WM_DELETE_WINDOW", self.on_cancel)
+        # 批次交易持有寫入鎖，期間不允許主視窗編輯
+        self.grab_set()
+
+    # ---------- UI Layout ----------
+    def _build_layout(self):
+        self.mode_var = tk.StringVar(value="apply")
+        mode_frame = tk.Frame(self)
+        mode_frame.pack(fill=tk.X, padx=10, pady=5)
+        for value, text in self.MODES:
+            tk.Radiobutton(
+                mode_frame, text=text, value=value, variable=self.mode_var,
+                command=self.on_mode_change
+            ).pack(side=tk.LEFT)
+
+        form_frame = tk.Frame(self)
+        form_frame.pack(fill=tk.X, padx=10, pady=5)
+        tk.Label(form_frame, text="搜尋文字").grid(row=0, column=0, sticky="w")
+        self.entry_find = tk.Entry(form_frame, width=40, state=tk.DISABLED)
+        self.entry_find.grid(row=0, column=1, pady=2)
+        tk.Label(form_frame, text="註解文字").grid(row=1, column=0, sticky="w")
+        self.entry_text = tk.Entry(form_frame, width=40)
+        self.entry_text.grid(row=1, column=1, pady=2)
+
+        self.progress_bar = ttk.Progressbar(self, length=400, maximum=max(len(self.img_paths), 1))
+        self.progress_bar.pack(padx=10, pady=5)
+        self.lbl_progress = tk.Label(self, text=f"0 / {len(self.img_paths)}")
+        self.lbl_progress.pack()
+
+        btn_frame = tk.Frame(self)
+        btn_frame.pack(fill=tk.X, padx=10, pady=5)
+        self.btn_cancel = tk.Button(btn_frame, text="取消", command=self.on_cancel)
+        self.btn_cancel.pack(side=tk.RIGHT, padx=5)
+        self.btn_run = tk.Button(btn_frame, text="執行", command=self.on_run)
+        self.btn_run.pack(side=tk.RIGHT)
+
+    # ---------- Event Handlers ----------
+    def on_mode_change(self):
+        mode = self.mode_var.get()
+        self.entry_find.config(state=tk.NORMAL if mode == "replace" else tk.DISABLED)
+        self.entry_text.config(state=tk.DISABLED if mode == "clear" else tk.NORMAL)
+
+    def on_run(self):
+        mode = self.mode_var.get()
+        if mode == "replace" and not self.entry_find.get():
+            messagebox.showinfo("資訊", "請輸入搜尋文字。", parent=self)
+            return
+        if mode == "clear" and not messagebox.askyesno(
+                "確認", f"確定清空 {len(self.img_paths)} 張圖片的註解？", parent=self):
+            return
+
+        kwargs = {
+            "img_paths": self.img_paths,
+            "mode": mode,
+            "text": self.entry_text.get(),
+            "find": self.entry_find.get(),
+            "progress": self._on_worker_progress,
+            "cancel": self._cancel_event.is_set,
+        }
+        self.btn_run.config(state=tk.DISABLED)
+        self._worker = threading.Thread(target=self._run_worker, kwargs=kwargs, daemon=True)
+        self._worker.start()
+        self.after(POLL_MS, self.on_poll)
+
+    def on_cancel(self):
+        if self._worker and self._worker.is_alive():
+            # 等背景作業 rollback 後才關閉視窗
+            self._cancel_event.set()
+            self.btn_cancel.config(state=tk.DISABLED)
+            self.lbl_progress.config(text="取消中…")
+            return
+        self.destroy()
+
+    def on_poll(self):
+        done, total = self._progress
+        self.progress_bar.config(value=done)
+        self.lbl_progress.config(text=f"{done} / {total}")
+
+        if self._worker.is_alive():
+            self.after(POLL_MS, self.on_poll)
+            return
+
+        if isinstance(self._error, OperationCancelledError):
+            messagebox.showinfo("資訊", "批次作業已取消，未變更任何註解。", parent=self)
+        elif isinstance(self._error, AppError):
+            messagebox.showerror("錯誤", self._error.user_msg, parent=self)
+        elif self._error:
+            messagebox.showerror("錯誤", "系統發生異常，請查看 log", parent=self)
+        else:
+            messagebox.showinfo(
+                "完成", f"已變更 {self._result['changed_count']} / {self._result['total_count']} 筆註解。",
+                parent=self
+            )
+        if self.on_done:
+            self.on_done()
+        self.destroy()
+
+    # ---------- Worker Thread ----------
+    def _on_worker_progress(self, done, total):
+        self._progress = (done, total)
+
+    def _run_worker(self, **kwargs):
+        try:
+            self._result = self.controller.batch_annotate(**kwargs)
+        except Exception as e:
+            if not isinstance(e, OperationCancelledError):
+                logger.exception("Batch annotate failed")
+            self._error = e
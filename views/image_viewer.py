@@ -2,15 +2,27 @@
  - 另開視窗檢視圖片
  - 縮放(Zoom)圖片大小: 滾輪縮放
  - 移動(Pan)圖片位置: 拖曳平移
+ - 區域註解(Region): 右鍵拖曳新增 bbox、Shift+左鍵點選頂點 / Enter 完成 polygon、Delete 刪除
+ - 只繪製與可視範圍相交的區域，平移時以 canvas.move 搬移，不重畫整張圖
 """
 
 import logging
 import tkinter as tk
+from tkinter import simpledialog, messagebox
 from PIL import Image, ImageTk
+from config.errors import AppError
+
+logger = logging.getLogger(__name__)
+
+REGION_COLOR = "#00ff66"
+REGION_HOVER_COLOR = "#ffcc00"
+DRAFT_COLOR = "#ff3366"
+# 區域查詢範圍 = 可視範圍向外擴張的比例，平移未超出時不需重新查詢
+REGION_QUERY_MARGIN = 0.5
 
 
 class ImageViewer(tk.Toplevel):
-    def __init__(self, parent, image_path):
+    def __init__(self, parent, controller, image_path):
         super().__init__(parent)
         self.transient(parent)
 
@@ -22,7 +34,9 @@ class ImageViewer(tk.Toplevel):
         self.canvas.pack(fill=tk.BOTH, expand=True)
 
         # Set
-        self.original_image = Image.open(image_path)
+        self.controller = controller
+        self.image_path = image_path
+        self.original_image = controller.open_image(image_path)["image"]
         self.scale = 1.0
         self._photo_image = None
         self._canvas_img_id = None
@@ -32,6 +46,15 @@ class ImageViewer(tk.Toplevel):
         self.offset_x = 0
         self.offset_y = 0
 
+        # Region: region_id => 區域資料 / canvas item
+        self._regions = {}
+        self._region_items = {}
+        # 上次查詢的原圖座標範圍 (x0, y0, x1, y1)
+        self._queried_rect = None
+        self._hover_region_id = None
+        self._draft_start = None
+        self._draft_points = []
+
         # event
         self._render_image()
 
@@ -41,6 +64,29 @@ class ImageViewer(tk.Toplevel):
         self.canvas.bind("<ButtonPress-1>", self.on_pan_start)
         self.canvas.bind("<B1-Motion>", self.on_pan_move)
         self.canvas.bind("<Double-Button-1>", self.on_reset)
+        self.canvas.bind("<Configure>", self.on_canvas_resize)
+        self.canvas.bind("<Motion>", self.on_hover)
+        self.canvas.bind("<ButtonPress-3>", self.on_bbox_start)
+        self.canvas.bind("<B3-Motion>", self.on_bbox_move)
+        self.canvas.bind("<ButtonRelease-3>", self.on_bbox_end)
+        self.canvas.bind("<Shift-Button-1>", self.on_polygon_point)
+        self.bind("<Return>", self.on_polygon_end)
+        self.bind("<Delete>", self.on_region_delete)
+
+    # ====== 座標轉換 ======
+    def _to_image(self, cx, cy):
+        # Canvas 座標 => 原圖座標
+        return (cx - self.offset_x) / self.scale, (cy - self.offset_y) / self.scale
+
+    def _to_canvas(self, x, y):
+        # 原圖座標 => Canvas 座標
+        return self.offset_x + x * self.scale, self.offset_y + y * self.scale
+
+    def _viewport_rect(self):
+        # 目前可視範圍 (原圖座標)
+        x0, y0 = self._to_image(0, 0)
+        x1, y1 = self._to_image(self.canvas.winfo_width(), self.canvas.winfo_height())
+        return x0, y0, x1, y1
 
     # ====== Event Handler ======
     def _render_image(self):
@@ -61,6 +107,70 @@ class ImageViewer(tk.Toplevel):
             anchor="nw"
         )
 
+        # 縮放後區域座標全部改變，清除後重新查詢
+        self._region_items.clear()
+        self._regions.clear()
+        self._queried_rect = None
+        self._hover_region_id = None
+        self._sync_regions()
+
+    def _sync_regions(self):
+        # 可視範圍仍在上次查詢範圍內時不重新查詢 rtree
+        vx0, vy0, vx1, vy1 = self._viewport_rect()
+        rect = self._queried_rect
+        if rect and rect[0] <= vx0 and rect[1] <= vy0 and rect[2] >= vx1 and rect[3] >= vy1:
+            return
+
+        mx = (vx1 - vx0) * REGION_QUERY_MARGIN
+        my = (vy1 - vy0) * REGION_QUERY_MARGIN
+        rect = (vx0 - mx, vy0 - my, vx1 + mx, vy1 + my)
+        try:
+            regions = self.controller.get_regions_in_view(self.image_path, *rect)["regions"]
+        except AppError:
+            logger.exception("Region query failed")
+            return
+        self._queried_rect = rect
+
+        visible = {region["id"]: region for region in regions}
+        # 移除離開範圍的區域
+        for region_id in list(self._region_items):
+            if region_id not in visible:
+                self.canvas.delete(self._region_items.pop(region_id))
+                self._regions.pop(region_id, None)
+        # 只新增尚未繪製的區域
+        for region_id, region in visible.items():
+            if region_id not in self._region_items:
+                self._regions[region_id] = region
+                self._region_items[region_id] = self._draw_region(region)
+
+    def _draw_region(self, region):
+        coords = []
+        for x, y in region["points"]:
+            coords.extend(self._to_canvas(x, y))
+
+        if region["kind"] == "bbox":
+            return self.canvas.create_rectangle(*coords, outline=REGION_COLOR, width=2, tags=("region", ))
+        return self.canvas.create_polygon(*coords, outline=REGION_COLOR, fill="", width=2, tags=("region", ))
+
+    def _set_hover(self, region):
+        region_id = region["id"] if region else None
+        if region_id == self._hover_region_id:
+            return
+
+        if self._hover_region_id in self._region_items:
+            self.canvas.itemconfig(self._region_items[self._hover_region_id], outline=REGION_COLOR)
+        self.canvas.delete("hover_label")
+        self._hover_region_id = region_id
+
+        if region and region_id in self._region_items:
+            self.canvas.itemconfig(self._region_items[region_id], outline=REGION_HOVER_COLOR)
+            if region["label"]:
+                x, y = self._to_canvas(region["bounds"][0], region["bounds"][1])
+                self.canvas.create_text(
+                    x, y - 4, text=region["label"], anchor="sw",
+                    fill=REGION_HOVER_COLOR, tags=("hover_label", )
+                )
+
     # ====== Bind Handler ======
     def on_zoom(self, event):
         old_scale = self.scale
@@ -92,7 +202,8 @@ class ImageViewer(tk.Toplevel):
         dx = event.x - self._pan_x
         dy = event.y - self._pan_y
 
-        # self.canvas.move(self._canvas_img_id, dx, dy)
+        # 圖片與區域一起搬移，不重新縮放圖片
+        self.canvas.move("all", dx, dy)
         self.offset_x += dx
         self.offset_y += dy
 
@@ -100,7 +211,7 @@ class ImageViewer(tk.Toplevel):
         self._pan_x = event.x
         self._pan_y = event.y
 
-        self._render_image()
+        self._sync_regions()
 
     def on_reset(self, event):
         self.scale = 1.0
@@ -114,4 +225,86 @@ class ImageViewer(tk.Toplevel):
 
         self._render_image()
 
+    def on_canvas_resize(self, event):
+        self._sync_regions()
+
+    def on_hover(self, event):
+        x, y = self._to_image(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        try:
+            regions = self.controller.hit_test_region(self.image_path, x, y)["regions"]
+        except AppError:
+            logger.exception("Region hit test failed")
+            return
+        self._set_hover(regions[0] if regions else None)
+
+    # ---- 新增 bbox: 右鍵拖曳 ----
+    def on_bbox_start(self, event):
+        self._draft_start = (self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        self.canvas.delete("draft")
+
+    def on_bbox_move(self, event):
+        if not self._draft_start:
+            return
+        self.canvas.delete("draft")
+        self.canvas.create_rectangle(
+            *self._draft_start, self.canvas.canvasx(event.x), self.canvas.canvasy(event.y),
+            outline=DRAFT_COLOR, dash=(4, 2), tags=("draft", )
+        )
+
+    def on_bbox_end(self, event):
+        if not self._draft_start:
+            return
+        x0, y0 = self._to_image(*self._draft_start)
+        x1, y1 = self._to_image(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        self._draft_start = None
+        self.canvas.delete("draft")
+
+        # 誤觸的極小框不建立
+        if abs(x1 - x0) * self.scale < 3 or abs(y1 - y0) * self.scale < 3:
+            return
+        points = [[min(x0, x1), min(y0, y1)], [max(x0, x1), max(y0, y1)]]
+        self._save_region("bbox", points)
+
+    # ---- 新增 polygon: Shift+左鍵加頂點，Enter 完成 ----
+    def on_polygon_point(self, event):
+        cx, cy = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        self._draft_points.append(list(self._to_image(cx, cy)))
+        self.canvas.create_oval(cx - 3, cy - 3, cx + 3, cy + 3, fill=DRAFT_COLOR, outline="", tags=("draft", ))
+        return "break"
+
+    def on_polygon_end(self, event):
+        points, self._draft_points = self._draft_points, []
+        self.canvas.delete("draft")
+        if len(points) >= 3:
+            self._save_region("polygon", points)
+
+    def _save_region(self, kind, points):
+        label = simpledialog.askstring("區域註解", "請輸入區域標籤：", parent=self)
+        if label is None:
+            return
+        try:
+            self.controller.add_region(self.image_path, kind, points, label)
+        except AppError as e:
+            logger.exception("Region add failed")
+            messagebox.showerror("錯誤", e.user_msg, parent=self)
+            return
+        # 新區域落在可視範圍內，強制重新查詢一次
+        self._queried_rect = None
+        self._sync_regions()
 
+    def on_region_delete(self, event):
+        region_id = self._hover_region_id
+        if region_id is None:
+            return
+        if not messagebox.askyesno("刪除區域", "確定刪除目前指向的區域？", parent=self):
+            return
+        try:
+            self.controller.delete_region(region_id)
+        except AppError as e:
+            logger.exception("Region delete failed")
+            messagebox.showerror("錯誤", e.user_msg, parent=self)
+            return
+        self._set_hover(None)
+        if region_id in self._region_items:
+            self.canvas.delete(self._region_items.pop(region_id))
+            self._regions.pop(region_id, None)
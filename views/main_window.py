@@ -10,19 +10,43 @@
 """
 
 import logging
+import threading
 import tkinter as tk
+from array import array
+from datetime import date
 import tkinter.font as tkFont
 from pathlib import Path
-from tkinter import filedialog, messagebox
-from models import ImageRepository, AnnotationDB
+from tkinter import ttk, filedialog, messagebox
+from models import ImageRepository, ArchiveImageRepository, AnnotationDB, EditJournal
 from controllers import ImageAnnotationController
 from views.image_viewer import ImageViewer
-from config.errors import AppError
+from views.batch_dialog import BatchAnnotationDialog
+from views.render_worker import RenderWorker
+from config.errors import AppError, ConflictError, OperationCancelledError
 # 安裝 pillow
-from PIL import Image, ImageTk
+from PIL import ImageTk
 
 logger = logging.getLogger(__name__)
 
+# 停止輸入多久後自動儲存快照至日誌 (毫秒)
+AUTOSAVE_IDLE_MS = 1500
+# 日誌定時併入 DB 的間隔 (毫秒)
+JOURNAL_FOLD_MS = 30 * 1000
+# 共用資料庫時輪詢其他人變更的間隔 (毫秒)
+CHANGE_POLL_MS = 5 * 1000
+# 背景建立圖片資訊時輪詢進度的間隔 (毫秒)
+METADATA_POLL_MS = 500
+# 清單排序選項 (顯示文字, 排序欄位)
+SORT_OPTIONS = (
+    ("檔名", None),
+    ("拍攝時間", "taken_at"),
+    ("修改時間", "mtime"),
+    ("檔案大小", "file_size"),
+    ("寬度", "width"),
+    ("高度", "height"),
+)
+ALL_OPTION = "全部"
+
 
 # ---------- Error Handlers ----------
 # def error_handler(exc: Exception):
@@ -62,19 +86,45 @@ class MainWindow(tk.Tk):
         # Auto Save flag => Annotation Update
         self._dirty = False
         self._dirty_img_path = None
+        # 自動儲存排程 (after id)，連續輸入時會被取消並重新排程
+        self._autosave_job = None
         # Image List Visible flag
         self.list_visible = None
         self.current_index_1_based = 1
         self.total_index = 0
         self.img_path = None
         self.db_path = None
+        self.db_shared = False
+        # 清單每一列對應的圖片索引 (0-based)，依排序 / 篩選條件，可能只含部分圖片
+        self._list_rows = []
+        # 圖片索引 => 清單列 (-1 = 不在清單中)
+        self._row_lookup = array("l")
+        self.filter_unannotated = tk.BooleanVar(value=False)
+        self.sort_desc = tk.BooleanVar(value=False)
+        # 背景建立圖片資訊 (取消旗標、進度、結果由背景執行緒寫入)
+        self._meta_cancel = threading.Event()
+        self._meta_worker = None
+        self._meta_progress = (0, 0)
+        self._meta_error = None
 
         safe_call(self._build_layout)
         safe_call(self._bind_events)
 
+        # 開圖 / 縮放交給背景執行緒，連續切頁只算最後停下的那張
+        self.render_worker = RenderWorker(
+            self,
+            lambda img_path, image, error: safe_call(
+                self.show_rendered_image, {"img_path": img_path, "image": image, "error": error}
+            )
+        )
+
         # set event bind
         self.bind("<Control-Left>", self.on_key_prev)
         self.bind("<Control-Right>", self.on_key_next)
+        self.bind("<Control-Down>", self.on_key_next_unannotated)
+        self.bind("<Control-Up>", self.on_key_prev_unannotated)
+        self.bind("<Control-Shift-Right>", self.on_key_next_annotated)
+        self.bind("<Control-Shift-Left>", self.on_key_prev_annotated)
         self.bind("<Control-s>", self.on_key_save)
         self.bind("<Escape>", self.off_show_list)
 
@@ -84,6 +134,10 @@ class MainWindow(tk.Tk):
         self.txt_annotation.bind("<Key>", self.on_text_modified)
         self.listbox.bind("<<ListboxSelect>>", self.on_list_select)
 
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(JOURNAL_FOLD_MS, self.on_journal_fold)
+        self.after(CHANGE_POLL_MS, self.on_change_poll)
+
     # ---------- UI Layout ----------
     def _build_layout(self):
         # ===== Top =====
@@ -96,6 +150,15 @@ class MainWindow(tk.Tk):
         self.btn_select = tk.Button(self.top_frame, text="選擇資料夾")
         # self.btn_select.pack(side=tk.LEFT)
 
+        self.btn_archive_select = tk.Button(self.top_frame, text="選擇壓縮檔")
+        # self.btn_archive_select.pack(side=tk.LEFT)
+
+        self.btn_batch = tk.Button(self.top_frame, text="批次註解")
+        # self.btn_batch.pack(side=tk.LEFT, padx=10)
+
+        self.chk_filter = tk.Checkbutton(self.top_frame, text="僅顯示未註記", variable=self.filter_unannotated)
+        # self.chk_filter.pack(side=tk.LEFT)
+
         self.lbl_folderName = tk.Label(self.top_frame, text="...")
         # self.lbl_folderName.pack(side=tk.LEFT)
 
@@ -105,6 +168,9 @@ class MainWindow(tk.Tk):
         self.lbl_status = tk.Label(self.top_frame, text="尚未載入資料")
         self.lbl_status.pack(side=tk.RIGHT)
 
+        self.lbl_metadata = tk.Label(self.top_frame, text="")
+        self.lbl_metadata.pack(side=tk.RIGHT, padx=10)
+
         # ===== Content =====
         self.content_frame = tk.Frame(self)
         self.content_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -113,7 +179,25 @@ class MainWindow(tk.Tk):
         self.list_frame = tk.Frame(self.content_frame, width=200)
         self.list_visible = False
 
-        self.listbox = tk.Listbox(self.list_frame, activestyle="none")
+        # 清單排序 / 篩選 (依圖片資訊，DB 索引查詢)
+        self.list_tool_frame = tk.Frame(self.list_frame)
+        self.list_tool_frame.pack(side=tk.TOP, fill=tk.X)
+        self.cmb_sort = ttk.Combobox(
+            self.list_tool_frame, state="readonly", width=10, values=[text for text, _ in SORT_OPTIONS]
+        )
+        self.cmb_sort.current(0)
+        self.cmb_sort.pack(side=tk.TOP, fill=tk.X)
+        self.chk_sort_desc = tk.Checkbutton(self.list_tool_frame, text="反向排序", variable=self.sort_desc)
+        self.chk_sort_desc.pack(side=tk.TOP, anchor="w")
+        self.cmb_format = ttk.Combobox(self.list_tool_frame, state="readonly", width=10, values=[ALL_OPTION])
+        self.cmb_format.current(0)
+        self.cmb_format.pack(side=tk.TOP, fill=tk.X)
+        self.cmb_camera = ttk.Combobox(self.list_tool_frame, state="readonly", width=10, values=[ALL_OPTION])
+        self.cmb_camera.current(0)
+        self.cmb_camera.pack(side=tk.TOP, fill=tk.X)
+
+        # EXTENDED: Ctrl / Shift 多選，供批次註解使用
+        self.listbox = tk.Listbox(self.list_frame, activestyle="none", selectmode=tk.EXTENDED)
         self.scroll_list = tk.Scrollbar(self.list_frame, command=self.listbox.yview)
         self.listbox.config(yscrollcommand=self.scroll_list.set)
         self.scroll_list.pack(side=tk.RIGHT, fill=tk.Y)
@@ -152,6 +236,9 @@ class MainWindow(tk.Tk):
         self.btn_next = tk.Button(self.bottom_frame, text="下一頁")
         self.btn_next.pack(side=tk.LEFT, padx=5)
 
+        self.btn_next_todo = tk.Button(self.bottom_frame, text="下一張未註記")
+        self.btn_next_todo.pack(side=tk.LEFT, padx=5)
+
         self.entry_jump = tk.Entry(self.bottom_frame, width=5, justify="center")
         self.entry_jump.pack(side=tk.LEFT, padx=5)
 
@@ -164,6 +251,15 @@ class MainWindow(tk.Tk):
     # ---------- Event Binding ----------
     def _bind_events(self):
         self.btn_select.config(command=lambda fc=self.on_select_folder: safe_call(fc))
+        self.btn_archive_select.config(command=lambda fc=self.on_select_archive: safe_call(fc))
+        self.btn_batch.config(command=lambda fc=self.on_batch_annotate: safe_call(fc))
+        self.chk_filter.config(command=lambda fc=self.refresh_listbox: safe_call(fc))
+        self.chk_sort_desc.config(command=lambda fc=self.refresh_listbox: safe_call(fc))
+        for cmb in (self.cmb_sort, self.cmb_format, self.cmb_camera):
+            cmb.bind("<<ComboboxSelected>>", lambda event, fc=self.refresh_listbox: safe_call(fc))
+        self.btn_next_todo.config(
+            command=lambda fc=self.on_jump_status: safe_call(fc, {"forward": True, "annotated": False})
+        )
         self.btn_db_select.config(command=lambda fc=self.on_select_folder_db: safe_call(fc))
         self.btn_prev.config(command=lambda fc=self.on_prev: safe_call(fc))
         self.btn_next.config(command=lambda fc=self.on_next: safe_call(fc))
@@ -176,11 +272,18 @@ class MainWindow(tk.Tk):
         self.db_path = filedialog.askopenfilename()
         if not self.db_path:
             return
+        self.db_shared = messagebox.askyesno(
+            "資料庫模式",
+            "是否與其他標註人員共用此資料庫？\n(啟用 WAL、版本衝突偵測與變更同步)"
+        )
 
         self.btn_db_select.pack_forget()
         self.btn_image_list.pack(side=tk.LEFT, padx=10)
         self.btn_select.pack(side=tk.LEFT)
+        self.btn_archive_select.pack(side=tk.LEFT)
         self.lbl_folderName.pack(side=tk.LEFT)
+        self.btn_batch.pack(side=tk.LEFT, padx=10)
+        self.chk_filter.pack(side=tk.LEFT)
 
     def on_select_folder(self):
         # 資料夾選擇：初始化所有資料來源
@@ -194,12 +297,106 @@ class MainWindow(tk.Tk):
 
         # 組裝(Composition)
         repo = ImageRepository(images_path)
-        db = AnnotationDB(self.db_path)
-        self.controller = ImageAnnotationController(repo, db)
+        self._load_source(repo)
+
+    def on_select_archive(self):
+        # 壓縮檔選擇：直接從 zip/tar 讀圖，不需解壓縮
+        archive_path = filedialog.askopenfilename(
+            filetypes=[("Archive", "*.zip *.tar"), ("All files", "*.*")]
+        )
+        if not archive_path or not self.db_path:
+            return
+
+        archive_path = Path(archive_path)
+        self.lbl_folderName.config(text=f" {archive_path.name}")
+        logger.info(f"壓縮檔選擇: {archive_path}")
+
+        # 索引快取放在資料庫旁
+        repo = ArchiveImageRepository(archive_path, cache_dir=Path(self.db_path).parent)
+        self._load_source(repo)
+
+    def _load_source(self, repo):
+        # 組裝(Composition)：切換圖源時先存檔並釋放舊圖源
+        if self.controller:
+            self._dirty_img_path = self.img_path
+            self.save_flag()
+            self.controller.flush_journal()
+            self.render_worker.cancel()
+            self._meta_cancel.set()
+            self.controller.img_repo.close()
+        db = AnnotationDB(self.db_path, shared=self.db_shared)
+        # 日誌與資料庫同名，放在資料庫旁
+        journal = EditJournal(Path(self.db_path).with_suffix(".journal"))
+        self.controller = ImageAnnotationController(repo, db, journal)
+        recovered = self.controller.recover_journal()["recovered_count"]
+        if recovered:
+            messagebox.showinfo("資訊", f"已從編輯日誌復原 {recovered} 筆未儲存的註解。")
         self.current_index_1_based = 1
         self.total_index = self.controller.get_total_count()["total_count"]
+        safe_call(self.refresh_metadata_options)
         safe_call(self.refresh_listbox)
         safe_call(self.update_view)
+        self.start_metadata_index()
+
+    def start_metadata_index(self):
+        # 背景建立圖片資訊 (只讀檔頭)，已快取且未變更的圖片會略過
+        self._meta_cancel = threading.Event()
+        self._meta_progress = (0, 0)
+        self._meta_error = None
+        self.lbl_metadata.config(text="圖片資訊建立中…")
+        self._meta_worker = threading.Thread(
+            target=self._run_metadata_index, args=(self.controller, self._meta_cancel), daemon=True
+        )
+        self._meta_worker.start()
+        self.after(METADATA_POLL_MS, self.on_metadata_poll, self._meta_worker)
+
+    def _run_metadata_index(self, controller, cancel_event):
+        # 背景執行緒
+        def progress(done, total):
+            if not cancel_event.is_set():
+                self._meta_progress = (done, total)
+        try:
+            controller.index_metadata(progress=progress, cancel=cancel_event.is_set)
+        except OperationCancelledError:
+            pass
+        except Exception as e:
+            if not cancel_event.is_set():
+                logger.exception("Metadata index failed")
+                self._meta_error = e
+
+    def on_metadata_poll(self, worker):
+        # 已切換圖源 (新的背景作業有自己的輪詢)
+        if worker is not self._meta_worker:
+            return
+        if worker.is_alive():
+            done, total = self._meta_progress
+            if total:
+                self.lbl_metadata.config(text=f"圖片資訊 {done} / {total}")
+            self.after(METADATA_POLL_MS, self.on_metadata_poll, worker)
+            return
+
+        self._meta_worker = None
+        if self._meta_cancel.is_set():
+            return
+        if self._meta_error:
+            self.lbl_metadata.config(text="圖片資訊建立失敗")
+            return
+        self.lbl_metadata.config(text="")
+        safe_call(self.refresh_metadata_options)
+        # 已選擇排序 / 篩選時，以新的圖片資訊重建清單
+        if self.cmb_sort.current() or self.cmb_format.current() or self.cmb_camera.current():
+            safe_call(self.refresh_listbox)
+
+    def refresh_metadata_options(self):
+        # 更新格式 / 相機篩選選項，保留目前選擇
+        if not self.controller:
+            return
+        options = self.controller.get_metadata_options()
+        for cmb, values in ((self.cmb_format, options["formats"]), (self.cmb_camera, options["cameras"])):
+            selected = cmb.get()
+            cmb.config(values=[ALL_OPTION] + values)
+            if selected not in values:
+                cmb.current(0)
 
     def on_prev(self):
         # 上一頁
@@ -211,9 +408,7 @@ class MainWindow(tk.Tk):
         if self.current_index_1_based == 1:
             messagebox.showinfo("資訊", "已經是第一頁。")
             return
-        self.current_index_1_based -= 1
-        safe_call(self.refresh_listbox)
-        safe_call(self.update_view)
+        self.go_to(self.current_index_1_based - 1)
 
     def on_next(self):
         # 下一頁
@@ -223,11 +418,9 @@ class MainWindow(tk.Tk):
         self._dirty_img_path = self.img_path
         safe_call(self.save_flag)
         if self.current_index_1_based == self.total_index:
-            messagebox.showinfo("資訊", "已經是第一頁。")
+            messagebox.showinfo("資訊", "已經是最後一頁。")
             return
-        self.current_index_1_based += 1
-        safe_call(self.refresh_listbox)
-        safe_call(self.update_view)
+        self.go_to(self.current_index_1_based + 1)
 
     def on_jump(self):
         if not self.controller:
@@ -242,21 +435,87 @@ class MainWindow(tk.Tk):
         if page < 1 or page > self.total_index:
             messagebox.showinfo("資訊", "超過頁數。")
             return
-        self.current_index_1_based = page
-        safe_call(self.refresh_listbox)
+        self.go_to(page)
+
+    def on_jump_status(self, forward=True, annotated=False):
+        # 跳到下一張 / 上一張 (未)註記的圖片 (狀態索引查詢，不逐張切頁)
+        if not self.controller:
+            return
+
+        self._dirty_img_path = self.img_path
+        safe_call(self.save_flag)
+        result = self.controller.find_image(self.current_index_1_based, forward, annotated)
+        if result["index_1_based"] is None:
+            messagebox.showinfo("資訊", "沒有符合條件的圖片。")
+            return
+        self.go_to(result["index_1_based"])
+
+    def go_to(self, index_1_based):
+        # 切換到指定圖片：清單只更新前一列顏色與選取位置
+        prev_index_1_based = self.current_index_1_based
+        self.current_index_1_based = index_1_based
+        safe_call(self.sync_listbox, {"prev_index_1_based": prev_index_1_based})
         safe_call(self.update_view)
 
     def on_save(self):
         self._dirty_img_path = self.img_path
-        safe_call(self.save_flag, {"force": True})
+        try:
+            self.save_flag(force=True)
+        except ConflictError as e:
+            logger.warning(f"Save conflict: {list(e.conflicts)}")
+            self.handle_conflicts(e.conflicts)
+            safe_call(self.refresh_listbox)
+            return
         safe_call(self.refresh_listbox)
+        safe_call(self.update_status)
         messagebox.showinfo("存檔完成", "已儲存")
 
+    def on_batch_annotate(self):
+        # 批次註解：對清單中選取的圖片套用
+        if not self.controller:
+            return
+        selection = self.listbox.curselection() if self.list_visible else ()
+        if not selection:
+            messagebox.showinfo("資訊", "請先開啟圖片清單並選取圖片（Ctrl / Shift 可多選）。")
+            return
+
+        # 先存目前編輯中的註解並入庫，批次結果才不會被覆蓋
+        self._dirty_img_path = self.img_path
+        self.save_flag()
+        self.controller.flush_journal()
+
+        images = self.controller.get_all_images()["images_list"]
+        img_paths = [images[self._list_rows[row]] for row in selection]
+        BatchAnnotationDialog(self, self.controller, img_paths, on_done=self.on_batch_done)
+
+    def on_batch_done(self):
+        self._dirty = False
+        safe_call(self.refresh_listbox)
+        safe_call(self.update_annotation)
+        safe_call(self.update_status)
+
+    def handle_conflicts(self, conflicts):
+        # 版本衝突：逐筆詢問覆寫或採用對方內容
+        for img_path, info in conflicts.items():
+            overwrite = messagebox.askyesno(
+                "版本衝突",
+                f"「{Path(img_path).stem}」的註解已被其他使用者修改。\n\n"
+                f"對方內容：\n{info['remote_note'] or '(空白)'}\n\n"
+                f"是否以你的內容覆寫？"
+            )
+            if overwrite:
+                self.controller.resolve_conflict(img_path, info["local_note"])
+            else:
+                self.controller.resolve_conflict(img_path)
+                if img_path == self.img_path:
+                    self._dirty = False
+                    safe_call(self.update_annotation)
+
     def save_flag(self, *, force=False):
         """
         Use case:
-            - 將目前正在編輯的圖片註解寫入 DB
-            - force=True 表示忽略 dirty
+            - 將目前正在編輯的圖片註解寫入編輯日誌 (切頁時，定時併入 DB)
+            - force=True 表示忽略 dirty，並立即寫入 DB
         """
         if not self._dirty_img_path:
             return False
@@ -265,7 +524,10 @@ class MainWindow(tk.Tk):
             return False
 
         text = self.txt_annotation.get("1.0", tk.END).strip()
-        result = self.controller.update_db_annotation(self._dirty_img_path, text)
+        if force:
+            result = self.controller.update_db_annotation(self._dirty_img_path, text)
+        else:
+            result = self.controller.journal_note(self._dirty_img_path, text)
 
         if result["success"]:
             self._dirty = False
@@ -279,29 +541,69 @@ class MainWindow(tk.Tk):
             self.list_frame.pack_forget()
             self.listbox.selection_clear(0, tk.END)
         else:
-            self.listbox.selection_set(self.current_index_1_based - 1)
+            row = self._row_of(self.current_index_1_based - 1)
+            if row is not None:
+                self.listbox.selection_set(row)
             self.list_frame.pack(side=tk.LEFT, fill=tk.Y)
 
         self.list_visible = not self.list_visible
 
+    def _row_of(self, index_0_based):
+        # 圖片索引 => 清單列，不在清單中回傳 None
+        if 0 <= index_0_based < len(self._row_lookup):
+            row = self._row_lookup[index_0_based]
+            if row >= 0:
+                return row
+        return None
+
     def refresh_listbox(self):
+        # 重建整個清單：註記狀態由狀態索引取得，不逐張查詢 DB
         if not self.controller:
             return
         yview = self.listbox.yview()
         self.listbox.delete(0, tk.END)
 
-        result = self.controller.get_all_images()
-        for img in result["images_list"]:
-            img = Path(img)
-            self.listbox.insert(tk.END, img.stem)
-            idx = self.listbox.index("end") - 1
-            note = self.controller.get_annotation(img)["annotation"]
-            if note:
-                self.listbox.itemconfig(idx, bg="gray")
-
-        self.listbox.selection_set(self.current_index_1_based - 1)
+        images = self.controller.get_all_images()["images_list"]
+        flags = self.controller.get_annotation_status()["flags"]
+        filters = {
+            "format": None if self.cmb_format.current() == 0 else self.cmb_format.get(),
+            "camera": None if self.cmb_camera.current() == 0 else self.cmb_camera.get(),
+        }
+        rows = self.controller.get_sorted_images(
+            SORT_OPTIONS[self.cmb_sort.current()][1], self.sort_desc.get(), filters
+        )["index_list"]
+        if self.filter_unannotated.get():
+            rows = [i for i in rows if not flags[i]]
+        self._list_rows = rows
+        self._row_lookup = array("l", [-1]) * len(images)
+        for row, i in enumerate(rows):
+            self._row_lookup[i] = row
+
+        self.listbox.insert(tk.END, *(Path(images[i]).stem for i in self._list_rows))
+        for row, i in enumerate(self._list_rows):
+            if flags[i]:
+                self.listbox.itemconfig(row, bg="gray")
+
+        row = self._row_of(self.current_index_1_based - 1)
+        if row is not None:
+            self.listbox.selection_set(row)
         self.listbox.yview_moveto(yview[0])
 
+    def sync_listbox(self, prev_index_1_based):
+        # 切頁時的輕量更新：重設前一張的顏色 (剛儲存過)，移動選取列
+        if not self.controller:
+            return
+        prev_row = self._row_of(prev_index_1_based - 1)
+        if prev_row is not None:
+            annotated = self.controller.get_image_status(prev_index_1_based)["annotated"]
+            self.listbox.itemconfig(prev_row, bg="gray" if annotated else "")
+
+        self.listbox.selection_clear(0, tk.END)
+        row = self._row_of(self.current_index_1_based - 1)
+        if row is not None:
+            self.listbox.selection_set(row)
+            self.listbox.see(row)
+
     # ---------- View Update ----------
     def update_view(self):
         safe_call(self.update_status)
@@ -309,8 +611,14 @@ class MainWindow(tk.Tk):
         safe_call(self.update_annotation)
 
     def update_status(self):
-        # 狀態處理
-        self.lbl_status.config(text=f"{self.current_index_1_based} / {self.total_index}")
+        # 狀態處理：頁碼 + 註記進度 (統計由 DB 計數表讀取，不掃描)
+        text = f"{self.current_index_1_based} / {self.total_index}"
+        if self.controller:
+            stats = self.controller.get_statistics()
+            today = stats["daily_edits"].get(date.today().isoformat(), 0)
+            text += (f"｜已註記 {stats['repo_annotated']} / {stats['repo_total']}"
+                     f" ({stats['progress']:.0%})｜今日編輯 {today}")
+        self.lbl_status.config(text=text)
 
     def update_annotation(self):
         # 註解處理
@@ -322,7 +630,7 @@ class MainWindow(tk.Tk):
             self.txt_annotation.insert("1.0", text)
 
     def update_image(self):
-        # 圖片顯示處理 Canvas
+        # 圖片顯示處理 Canvas：只送出算圖請求，不在主執行緒開圖
         if not self.controller:
             return
 
@@ -330,10 +638,7 @@ class MainWindow(tk.Tk):
         if not self.img_path:
             return
 
-        # 1.開圖
-        img = Image.open(self.img_path)
-
-        # 2.取得 Canvas 大小
+        # 1.取得 Canvas 大小
         self.canvas.update_idletasks()
         canvas_w = self.canvas.winfo_width()
         canvas_h = self.canvas.winfo_height()
@@ -341,29 +646,29 @@ class MainWindow(tk.Tk):
         if canvas_w <= 1 or canvas_h <= 1:
             return  # 尚未初始化完成
 
-        # 3. 等比例縮放
-        img_ratio = img.width / img.height
-        canvas_ratio = canvas_w / canvas_h
+        # 2.算圖期間保留上一張圖，左上角顯示載入中
+        self.canvas.delete("loading")
+        self.canvas.create_text(10, 10, text="載入中…", fill="white", anchor="nw", tags="loading")
 
-        if img_ratio > canvas_ratio:
-            # 原圖 > 視窗尺寸  =>  依視窗寬、調高
-            new_w = canvas_w
-            new_h = int(canvas_w / img_ratio)
-        else:
-            # 原圖 < 視窗尺寸  =>  調寬、依視窗高
-            new_h = canvas_h
-            new_w = int(canvas_h * img_ratio)
+        # 3.背景開圖、等比例縮放，完成後回到 show_rendered_image
+        self.render_worker.request(self.controller, self.img_path, (canvas_w, canvas_h))
 
-        img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    def show_rendered_image(self, img_path, image, error=None):
+        # 背景算圖完成 (主執行緒)
+        if img_path != self.img_path:
+            return
+        self.canvas.delete("loading")
+        if error:
+            raise error
 
         # 4. 轉成 Tk Image
-        self._photo_image = ImageTk.PhotoImage(img)
+        self._photo_image = ImageTk.PhotoImage(image)
 
         # 5. 清空並顯示
         self.canvas.delete("all")
         self.canvas.create_image(
-            canvas_w // 2,
-            canvas_h // 2,
+            self.canvas.winfo_width() // 2,
+            self.canvas.winfo_height() // 2,
             image=self._photo_image,
             anchor="center"
         )
@@ -374,7 +679,7 @@ class MainWindow(tk.Tk):
 
     def on_open_image_viewer(self, event):
         if self.img_path:
-            ImageViewer(self, self.img_path)
+            ImageViewer(self, self.controller, self.img_path)
 
     # Windows bind
     def on_key_prev(self, event):
@@ -383,6 +688,18 @@ class MainWindow(tk.Tk):
     def on_key_next(self, event):
         safe_call(self.on_next)
 
+    def on_key_next_unannotated(self, event):
+        safe_call(self.on_jump_status, {"forward": True, "annotated": False})
+
+    def on_key_prev_unannotated(self, event):
+        safe_call(self.on_jump_status, {"forward": False, "annotated": False})
+
+    def on_key_next_annotated(self, event):
+        safe_call(self.on_jump_status, {"forward": True, "annotated": True})
+
+    def on_key_prev_annotated(self, event):
+        safe_call(self.on_jump_status, {"forward": False, "annotated": True})
+
     def on_key_save(self, event):
         safe_call(self.on_save)
 
@@ -394,17 +711,67 @@ class MainWindow(tk.Tk):
     def on_text_modified(self, event):
         if event.char:
             self._dirty = True
+            # 合併連續按鍵：停止輸入 AUTOSAVE_IDLE_MS 後才儲存一次
+            if self._autosave_job:
+                self.after_cancel(self._autosave_job)
+            self._autosave_job = self.after(AUTOSAVE_IDLE_MS, self.on_autosave)
+
+    # Timer
+    def on_autosave(self):
+        self._autosave_job = None
+        if not self.controller or not self.img_path:
+            return
+        self._dirty_img_path = self.img_path
+        safe_call(self.save_flag)
+
+    def on_journal_fold(self):
+        if self.controller:
+            safe_call(self.controller.flush_journal)
+            safe_call(self.update_status)
+            safe_call(self.check_conflicts)
+        self.after(JOURNAL_FOLD_MS, self.on_journal_fold)
+
+    def on_change_poll(self):
+        if self.controller:
+            safe_call(self.sync_changes)
+            safe_call(self.check_conflicts)
+        self.after(CHANGE_POLL_MS, self.on_change_poll)
+
+    def sync_changes(self):
+        # 只更新其他人變更過的部分
+        changed = self.controller.poll_changes()["changed_paths"]
+        if not changed:
+            return
+        if self.img_path in changed and not self._dirty:
+            safe_call(self.update_annotation)
+        safe_call(self.refresh_listbox)
+        safe_call(self.update_status)
+
+    def check_conflicts(self):
+        conflicts = self.controller.pop_conflicts()["conflicts"]
+        if conflicts:
+            self.handle_conflicts(conflicts)
+
+    def on_close(self):
+        # 關閉前將未入庫的註解寫入 DB
+        if self.controller:
+            self._dirty_img_path = self.img_path
+            safe_call(self.save_flag)
+            safe_call(self.controller.flush_journal)
+            self.render_worker.close()
+            self._meta_cancel.set()
+            self.controller.img_repo.close()
+        self.destroy()
 
     def on_list_select(self, event):
         selection = self.listbox.curselection()
-        if not selection:
+        # 多選是為了批次註解，不切換圖片
+        if len(selection) != 1:
             return
 
         self._dirty_img_path = self.img_path
         safe_call(self.save_flag)
-        self.current_index_1_based = selection[0] + 1
-        safe_call(self.update_view)
-        safe_call(self.refresh_listbox)
+        self.go_to(self._list_rows[selection[0]] + 1)
 
 
 if __name__ == "__main__":
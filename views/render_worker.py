@@ -0,0 +1,105 @@
+""" 背景圖片算圖
+ - 開圖 / 解碼 / 縮放在背景執行緒執行，Tk 主執行緒不等待圖片 I/O
+ - 只保留「最新的一筆」請求：連續切頁時，中間被取代的請求直接丟棄，只算最後停下的那張
+ - 結果放入 queue，由主執行緒以 after() 取回 (PhotoImage 只能在主執行緒建立)
+"""
+
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+POLL_MS = 30
+
+
+class RenderWorker:
+    def __init__(self, widget, on_ready):
+        # widget: 用來排程 after() 的 Tk 元件
+        # on_ready(img_path, image, error): 在主執行緒呼叫，只會收到最新請求的結果
+        self.widget = widget
+        self.on_ready = on_ready
+
+        self._cond = threading.Condition()
+        # 最新請求 (seq, controller, img_path, size)，尚未取走時被新請求覆蓋
+        self._slot = None
+        self._seq = 0
+        # 背景執行緒正在處理的請求序號，閒置時為 None
+        self._busy_seq = None
+        self._stopped = False
+        self._results = queue.Queue()
+        self._polling = False
+
+        self._thread = threading.Thread(target=self._run, name="RenderWorker", daemon=True)
+        self._thread.start()
+
+    # ---------- 主執行緒 ----------
+    def request(self, controller, img_path, size):
+        # 送出算圖請求並取代尚未處理的舊請求；不阻塞
+        with self._cond:
+            self._seq += 1
+            self._slot = (self._seq, controller, img_path, size)
+            self._cond.notify()
+        if not self._polling:
+            self._polling = True
+            self.widget.after(POLL_MS, self._poll)
+
+    def cancel(self):
+        # 丟棄尚未處理與處理中的請求 (結果回來時會因序號過期而丟棄)
+        with self._cond:
+            self._seq += 1
+            self._slot = None
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            self._slot = None
+            self._cond.notify()
+
+    def _poll(self):
+        latest = None
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if result[0] == self._seq:
+                latest = result
+
+        if latest is not None:
+            _, img_path, image, error = latest
+            self.on_ready(img_path, image, error)
+
+        with self._cond:
+            # 結果在鎖內放入 queue，這裡看到閒置就不會漏掉尚未取回的結果
+            pending = self._slot is not None or self._busy_seq is not None or not self._results.empty()
+        if pending and not self._stopped:
+            self.widget.after(POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    # ---------- 背景執行緒 ----------
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._slot is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                seq, controller, img_path, size = self._slot
+                self._slot = None
+                self._busy_seq = seq
+
+            image, error = None, None
+            try:
+                image = controller.get_preview_image(img_path, size)["image"]
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                self._busy_seq = None
+                if seq == self._seq:
+                    self._results.put((seq, img_path, image, error))
+                else:
+                    # 算圖期間已有新請求，結果直接丟棄
+                    logger.debug(f"丟棄過期的算圖結果: {img_path}")